@@ -4,6 +4,7 @@ from .engine import Engine
 from .loader import Loader
 from .events import EntityEvent
 from .base_system import BaseSystem
+from .scheduler import Scheduler
 
 
 __all__ = [
@@ -14,4 +15,5 @@ __all__ = [
     'Loader',
     'EntityEvent',
     'BaseSystem',
+    'Scheduler',
 ]
@@ -0,0 +1,76 @@
+from __future__ import annotations
+from beartype.typing import TYPE_CHECKING
+from beartype.typing import Iterator
+
+if TYPE_CHECKING:
+    from pecs_framework.entity import Entity
+
+
+class Archetype:
+    """
+    One distinct set of component types, interned by an ArchetypeTable.
+
+    Entities point at their Archetype instead of carrying their own mask, so
+    adding or removing a component is a cached transition between interned
+    archetypes, and queries can remember their verdict per archetype `id`
+    instead of redoing wide bitwise arithmetic for every entity.
+
+    `entities` holds the live entities currently in the archetype, in the
+    order they arrived, so whole groups can be skipped when a query that
+    does not match them is rebuilt.
+    """
+    __slots__ = ("id", "mask", "bits", "entities", "_table", "_with", "_without")
+
+    def __init__(self, table: ArchetypeTable, aid: int, mask: int) -> None:
+        self.id = aid
+        self.mask = mask
+        self.bits = frozenset(
+            bit for bit in range(mask.bit_length()) if (mask >> bit) & 1
+        )
+        self.entities: dict[Entity, None] = {}
+        self._table = table
+        self._with: dict[int, Archetype] = {}
+        self._without: dict[int, Archetype] = {}
+
+    def __repr__(self) -> str:
+        return f"Archetype({self.id}, bits={sorted(self.bits)})"
+
+    def with_bit(self, bit: int) -> Archetype:
+        archetype = self._with.get(bit)
+        if archetype is None:
+            archetype = self._table.intern(self.mask | (1 << bit))
+            self._with[bit] = archetype
+        return archetype
+
+    def without_bit(self, bit: int) -> Archetype:
+        archetype = self._without.get(bit)
+        if archetype is None:
+            archetype = self._table.intern(self.mask & ~(1 << bit))
+            self._without[bit] = archetype
+        return archetype
+
+
+class ArchetypeTable:
+    """Interns component masks as Archetypes with small, dense ids."""
+
+    def __init__(self) -> None:
+        self._by_mask: dict[int, Archetype] = {}
+        self._archetypes: list[Archetype] = []
+        self.empty = self.intern(0)
+
+    def __len__(self) -> int:
+        return len(self._archetypes)
+
+    def __iter__(self) -> Iterator[Archetype]:
+        return iter(self._archetypes)
+
+    def __getitem__(self, aid: int) -> Archetype:
+        return self._archetypes[aid]
+
+    def intern(self, mask: int) -> Archetype:
+        archetype = self._by_mask.get(mask)
+        if archetype is None:
+            archetype = Archetype(self, len(self._archetypes), mask)
+            self._by_mask[mask] = archetype
+            self._archetypes.append(archetype)
+        return archetype
@@ -1,13 +1,17 @@
 from __future__ import annotations
 from beartype.typing import TYPE_CHECKING
+from beartype.typing import ClassVar
 
 if TYPE_CHECKING:
     from pecs_framework.domain import Domain
     from pecs_framework.engine import Engine
     from pecs_framework.query import ComponentQuery
-    from pecs_framework.query import Query
+    from pecs_framework.query import SortKey
+    from pecs_framework.query import QueryHandle
+    from pecs_framework.component import ComponentMeta
 
 from abc import ABC, abstractmethod
+from pecs_framework.scheduler import Scheduler
 
 
 class Loop(ABC):
@@ -15,15 +19,31 @@ class Loop(ABC):
     def __init__(self, ecs: Engine, domain: Domain) -> None:
         self.ecs = ecs
         self.domain = domain
+        self.systems: list[BaseSystem] = []
+        self._scheduler: Scheduler | None = None
         self.initialize()
 
+    @property
+    def scheduler(self) -> Scheduler:
+        """
+        A Scheduler over the loop's registered systems, rebuilt whenever
+        systems are added or torn down.
+        """
+        if self._scheduler is None or self._scheduler.systems != self.systems:
+            self._scheduler = Scheduler(self.systems)
+        return self._scheduler
+
     @abstractmethod
     def initialize(self) -> None:
         raise NotImplementedError("Method has no implementation")
 
-    @abstractmethod
     def teardown(self) -> None:
-        raise NotImplementedError("Method has no implementation")
+        """
+        Tear down every system registered with this loop, disposing of their
+        queries. Subclasses overriding this should call `super().teardown()`.
+        """
+        for system in reversed(self.systems):
+            system.teardown()
 
     @abstractmethod
     def pre_update(self) -> None:
@@ -39,10 +59,24 @@ class Loop(ABC):
 
 
 class BaseSystem:
+    # Component types this system reads and writes, used by the Scheduler to
+    # decide which systems may share a stage. A system that declares neither
+    # is treated as conflicting with every other system.
+    reads: ClassVar[tuple[ComponentMeta, ...]] = ()
+    writes: ClassVar[tuple[ComponentMeta, ...]] = ()
+
+    # Systems that must run before this one regardless of component access.
+    after: ClassVar[tuple[type[BaseSystem], ...]] = ()
+
+    # Run only on Domain ticks divisible by `interval`. Low priority systems
+    # are the first to be put off when a tick runs past its frame budget.
+    interval: ClassVar[int] = 1
+    low_priority: ClassVar[bool] = False
 
     def __init__(self, loop: Loop) -> None:
         self.loop = loop
-        self._queries: dict[str, Query] = {}
+        self._queries: dict[str, QueryHandle] = {}
+        loop.systems.append(self)
         self.initialize()
 
     def query(
@@ -51,16 +85,45 @@ class BaseSystem:
         all_of: ComponentQuery | None = None,
         any_of: ComponentQuery | None = None,
         none_of: ComponentQuery | None = None,
+        *,
+        sort_key: SortKey | None = None,
     ) -> None:
         all_of = all_of if all_of else []
         any_of = any_of if any_of else []
         none_of = none_of if none_of else []
+        if key in self._queries:
+            self._queries[key].dispose()
         self._queries[key] = self.loop.domain.create_query(
             all_of,
             any_of,
             none_of,
+            sort_key=sort_key,
         )
 
+    @property
+    def declares_access(self) -> bool:
+        return bool(self.reads or self.writes)
+
+    def access(self) -> tuple[frozenset[str], frozenset[str]]:
+        """The comp_ids of the declared read and write sets."""
+        return (
+            frozenset(c.comp_id for c in self.reads),
+            frozenset(c.comp_id for c in self.writes),
+        )
+
+    def release(self, key: str) -> None:
+        self._queries.pop(key).dispose()
+
+    def teardown(self) -> None:
+        """
+        Dispose of all of this system's queries and detach it from its loop.
+        """
+        for query in self._queries.values():
+            query.dispose()
+        self._queries.clear()
+        if self in self.loop.systems:
+            self.loop.systems.remove(self)
+
     def initialize(self):
         raise NotImplementedError("Method has no implementation")
 
@@ -2,18 +2,46 @@ from __future__ import annotations
 from beartype.typing import TypeVar
 from beartype.typing import TypedDict
 from beartype.typing import Any
+from beartype.typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from pecs_framework._types import Bases, Namespace
 
-from pecs_framework._types import Bases, Namespace
 from pecs_framework.events import EntityEvent
 
+import copy
 import sys
 import traceback
 
 
+# Cbits reserved by a lazy Loader's manifest, by (module, class name), for
+# classes that have not been defined yet. A class picks up its reservation
+# when it is created, even when its module is imported directly instead of
+# through the ComponentRegistry.
+_reserved_cbits: dict[tuple[str, str], int] = {}
+
+
+def reserve_cbit(module: str, name: str, cbit: int) -> None:
+    _reserved_cbits[(module, name)] = cbit
+
+
 class ComponentMeta(type):
-    """Base Component Metaclass"""
+    """
+    Base Component Metaclass
+
+    Passing `tag=True` in the class statement declares a tag component: a
+    data-less marker that only sets its bit on the entity. Tags are never
+    instantiated, stored in `Entity.components`, or visited by events. The
+    setting is inherited by subclasses unless they pass `tag` themselves.
+
+    ```py
+    class IsFrozen(Component, tag=True):
+        pass
+    ```
+    """
     comp_id: str
     cbit: int
+    is_tag: bool
     _entity_id: str
 
     def __new__(
@@ -21,21 +49,54 @@ class ComponentMeta(type):
         clsname: str,
         bases: Bases,
         namespace: Namespace,
+        tag: bool | None = None,
+        **kwargs: Any,
     ) -> ComponentMeta:
-        clsobj = super().__new__(cls, clsname, bases, namespace)
+        clsobj = super().__new__(cls, clsname, bases, namespace, **kwargs)
         clsobj.comp_id = clsname.upper()
-        clsobj.cbit = 0
+        module = namespace.get("__module__")
+        clsobj.cbit = _reserved_cbits.get((module, clsname), 0)
+        if tag is not None:
+            clsobj.is_tag = tag
+        elif not hasattr(clsobj, "is_tag"):
+            clsobj.is_tag = False
         return clsobj
 
 
 class Component(metaclass=ComponentMeta):
     """Root Component class that all components extend."""
     _entity_id: str
+    _changed_tick: int = -1
 
     @property
     def entity_id(self) -> str:
         return self._entity_id
 
+    @property
+    def changed_tick(self) -> int:
+        """The Domain tick this component was last marked changed, or -1."""
+        return self._changed_tick
+
+    def reset(self, **properties: Any) -> None:
+        """
+        Reinitialize a pooled instance before it is attached again, as if it
+        had been constructed with `properties`. Override this for components
+        whose construction is expensive or has side effects.
+        """
+        vars(self).clear()
+        self.__init__(**properties)
+
+    def copy(self) -> Component:
+        """
+        Return an independent copy of this instance for a forked Domain (see
+        `Domain.fork`). The default is a shallow copy, so mutable containers
+        held in fields stay shared; override this for components that modify
+        such containers in place. References to other entities must be kept
+        as they are, never copied; direct fields are then pointed at the
+        forked Domain's entities.
+        """
+        return copy.copy(self)
+
     def handle_event(self, evt: EntityEvent):
         self.on_event(evt)
 
@@ -2,25 +2,34 @@ from __future__ import annotations
 from beartype.typing import TYPE_CHECKING
 from beartype.typing import Any
 from beartype.typing import TypedDict
+from beartype.typing import Callable
+from beartype.typing import Iterator
 
 from uuid import uuid1
-from collections import OrderedDict
+from contextlib import contextmanager
+from contextlib import nullcontext
 import json
+import threading
 
 if TYPE_CHECKING:
     from pecs_framework.component import Component
     from pecs_framework.engine import Engine
+    from pecs_framework.memory import MemoryReport
+    from pecs_framework.profiling import Profiler
+    from pecs_framework.snapshot import SnapshotBuffer
     from pecs_framework.prefab import EntityTemplate
     from pecs_framework.query import ComponentQuery
+    from pecs_framework.query import SortKey
 
 from pathlib import Path
+from pecs_framework.archetype import ArchetypeTable
 from pecs_framework.entity import Entity
 from pecs_framework.query import Query
-from rich.console import Console
+from pecs_framework.query import QueryHandle
+from pecs_framework.query import QueryKey
+from pecs_framework.query import query_key
 
 
-console = Console()
-
 class ComponentDict(TypedDict):
     comp_id: str
     cbit: int
@@ -36,9 +45,34 @@ class EntityRegistry:
 
     def __init__(self, domain: Domain) -> None:
         self.domain = domain
-        self.alias_to_eid = OrderedDict()
-        self.eid_to_alias = OrderedDict()
-        self._map: dict[str, Entity] = OrderedDict()
+        # Built-in dicts keep insertion order, which `fire_event` and `save`
+        # rely on, at a fraction of the memory of OrderedDict.
+        self.alias_to_eid: dict[str, str] = {}
+        self.eid_to_alias: dict[str, str] = {}
+        self._map: dict[str, Entity] = {}
+        self._pool: list[Entity] = []
+        self._pool_size: int = 0
+        # Destroyed entities wait here until the next tick, while queries
+        # may still report them as removed.
+        self._retired: list[Entity] = []
+
+    def enable_pool(self, max_size: int) -> None:
+        """
+        Recycle up to `max_size` destroyed Entity objects for reuse by
+        `create`. A destroyed entity becomes reusable once the Domain has
+        advanced past the tick it was destroyed in, so change-tracking
+        queries can still report it as removed. References to destroyed
+        entities must not be kept beyond that, since the same object may come
+        back with a new identity.
+        """
+        self._pool_size = max_size
+        del self._pool[max_size:]
+        del self._retired[max(0, max_size - len(self._pool)):]
+
+    def recycle(self) -> None:
+        """Move retired entities into the pool. Called by `Domain.advance_tick`."""
+        self._pool.extend(self._retired)
+        self._retired.clear()
 
     def __getitem__(self, key: str) -> Entity:
         return self._map[key]
@@ -93,17 +127,22 @@ class EntityRegistry:
         -------
             The newly created Entity instance
         """
-        entity = Entity(
-            self.domain,
-            entity_id if entity_id else self.domain.create_uid(),
-        )
-        self._map[entity.eid] = entity
-
-        if alias:
-            if alias in self.alias_to_eid:
+        # Systems sharing a deferred stage may create entities concurrently.
+        domain = self.domain
+        with domain._defer_lock if domain.deferring else nullcontext():
+            if alias and alias in self.alias_to_eid:
                 raise KeyError(f"Entity already exists with alias {alias}")
-            self.alias_to_eid[alias] = entity.eid
-            self.eid_to_alias[entity.eid] = alias
+            eid = entity_id if entity_id else self.domain.create_uid()
+            if self._pool:
+                entity = self._pool.pop()
+                entity._reset(eid)
+            else:
+                entity = Entity(self.domain, eid)
+            self._map[entity.eid] = entity
+
+            if alias:
+                self.alias_to_eid[alias] = entity.eid
+                self.eid_to_alias[entity.eid] = alias
 
         return entity
 
@@ -167,13 +206,17 @@ class EntityRegistry:
         return self.eid_to_alias.get(entity_or_eid.eid, None)
 
     def remove_entity_by_id(self, entity_id: str) -> None:
-        self._map[entity_id]._on_entity_destroyed()
+        entity = self._map[entity_id]
+        entity._on_entity_destroyed()
         del self._map[entity_id]
+        if len(self._pool) + len(self._retired) < self._pool_size:
+            self._retired.append(entity)
 
     def remove_entity_by_alias(self, alias: str) -> None:
         entity_id = self.get_entity_id(alias)
         if alias in self.alias_to_eid:
             del self.alias_to_eid[alias]
+            self.eid_to_alias.pop(entity_id, None)
         self.remove_entity_by_id(entity_id)
 
 
@@ -185,13 +228,209 @@ class Domain:
 
     def __init__(self, engine: Engine) -> None:
         self.engine = engine
+        self._deferred: list[Callable[[], Any]] | None = None
+        self._defer_lock = threading.Lock()
+        self.profiler: Profiler | None = None
+        self.snapshots: SnapshotBuffer | None = None
         self.reset()
 
+    def enable_profiling(self, profiler: Profiler | None = None) -> Profiler:
+        """
+        Start recording system, query and event statistics for this Domain.
+
+        Returns
+        -------
+            The attached Profiler
+        """
+        if profiler is None:
+            from pecs_framework.profiling import Profiler
+            profiler = Profiler()
+        self.profiler = profiler
+        return profiler
+
+    def disable_profiling(self) -> Profiler | None:
+        profiler, self.profiler = self.profiler, None
+        return profiler
+
+    def enable_snapshots(self, capacity: int = 60) -> SnapshotBuffer:
+        """
+        Keep a rollback buffer of this Domain's last `capacity` captured
+        ticks. Call `capture` on it once per tick.
+
+        Returns
+        -------
+            The attached SnapshotBuffer
+        """
+        from pecs_framework.snapshot import SnapshotBuffer
+        self.snapshots = SnapshotBuffer(self, capacity)
+        return self.snapshots
+
+    def memory_report(self) -> MemoryReport:
+        """Estimate the memory held by this Domain's entities and caches."""
+        from pecs_framework.memory import domain_memory
+        return domain_memory(self)
+
     def reset(self) -> None:
+        self.archetypes = ArchetypeTable()
         self.entities = EntityRegistry(self)
         self.queries: list[Query] = []
+        self._query_map: dict[QueryKey, Query] = {}
+        self.tick: int = 0
+
+    def advance_tick(self) -> int:
+        """
+        Move the Domain on to its next tick, clearing the per-tick added,
+        removed and changed sets of every change-tracking Query and
+        releasing entities destroyed so far to the entity pool.
+
+        Returns
+        -------
+            The new tick number
+        """
+        self.tick += 1
+        for query in self.queries:
+            query.clear_changes()
+        self.entities.recycle()
+        return self.tick
+
+    def fork(self) -> Domain:
+        """
+        Create a copy-on-write child of this Domain, for speculative
+        simulation or as a rollback point.
+
+        The child gets its own Entity objects, with the same ids, aliases and
+        component sets, but starts out with the parent's component instances.
+        The child copies an instance, through `Component.copy`, the first time
+        it reads one through `entity[Type]`, `get_component`, `mark_changed`,
+        or fires an event on the entity. The parent is left alone: its
+        entities keep their instances, so references it already holds stay
+        valid, and forking costs it nothing afterwards. In return, changes the
+        parent makes to a component the child has not read yet show through
+        in the child.
+        Attaching, removing and destroying never affect the other side. The
+        child has no queries of its own yet, is not registered on the Engine,
+        and is discarded by dropping it.
+
+        Fields of a copied component that reference an entity of the parent
+        are pointed at the child's entity with the same id, so events fired
+        through them stay in the child. References nested in containers are
+        not remapped. Components reached directly through `entity.components`
+        are not copied and must be treated as read-only on a forked Domain.
+
+        Returns
+        -------
+            The child Domain
+        """
+        child = Domain(self.engine)
+        child.tick = self.tick
+        entities = child.entities
+        entities.alias_to_eid = dict(self.entities.alias_to_eid)
+        entities.eid_to_alias = dict(self.entities.eid_to_alias)
+
+        for entity in self.entities:
+            twin = Entity(child, entity.eid)
+            twin._move(child.archetypes.intern(entity.archetype.mask))
+            twin.components = dict(entity.components)
+            if entity.components:
+                twin._shared = set(entity.components)
+            entities._map[entity.eid] = twin
+        return child
+
+    @property
+    def deferring(self) -> bool:
+        return self._deferred is not None
+
+    @contextmanager
+    def deferred(self) -> Iterator[None]:
+        """
+        Queue structural changes (component attach/remove and entity
+        destruction) and change notifications (`mark_changed`) made inside
+        the block and apply them in order when it exits. Changes are
+        discarded if the block raises.
+
+        Entities created inside the block, directly or from a prefab, exist
+        at once (creation is safe from several threads) and are not removed
+        if the block raises, but the components of a prefab are attached on
+        exit like any other. A component marked changed gets its tick stamp
+        immediately, while query change sets, change hooks and sorted
+        positions are only updated on exit. Changes queued for an entity that
+        an earlier queued command destroyed are dropped.
+
+        ```py
+        with domain.deferred():
+            ecs.components.attach(entity, IsFrozen)
+            assert not ecs.components.has(entity, IsFrozen)
+        assert ecs.components.has(entity, IsFrozen)
+        ```
+        """
+        if self._deferred is not None:
+            yield
+            return
+
+        self._deferred = []
+        try:
+            yield
+        except BaseException:
+            self._deferred = None
+            raise
+
+        commands, self._deferred = self._deferred, None
+        for command in commands:
+            command()
+
+    def defer(
+        self,
+        command: Callable[[], Any],
+        entity: Entity | None = None,
+    ) -> bool:
+        """
+        Queue a command if the Domain is currently deferring structural
+        changes.
+
+        Parameters
+        ----------
+        command
+            The change to apply when the deferred block exits
+        entity, optional
+            The Entity the command applies to. The command is dropped if that
+            entity has been destroyed by the time the queue is applied, for
+            example by an earlier command of the same stage
+
+        Returns
+        -------
+            True if the command was queued, False if it should run now
+        """
+        if self._deferred is None:
+            return False
+        if entity is not None:
+            queued = command
+
+            def command() -> None:
+                if self.exists(entity):
+                    queued()
+
+        with self._defer_lock:
+            self._deferred.append(command)
+        return True
+
+    def exists(self, entity: Entity) -> bool:
+        """Whether `entity` is a live Entity of this Domain."""
+        return self.entities._map.get(entity.eid) is entity
 
     def destroy_entity(self, entity: Entity | str) -> None:
+        if isinstance(entity, str):
+            entities = self.entities
+            if entity in entities.keys():
+                entity = entities.get_by_id(entity)
+            elif entity in entities.alias_to_eid:
+                entity = entities.get_by_alias(entity)
+
+        if isinstance(entity, str):
+            if self.defer(lambda: self.destroy_entity(entity)):
+                return
+        elif self.defer(lambda: self.destroy_entity(entity), entity):
+            return
+
         if isinstance(entity, str):
             if entity in self.entities.keys():
                 self.entities.remove_entity_by_id(entity)
@@ -211,14 +450,101 @@ class Domain:
         all_of: ComponentQuery | None = None,
         any_of: ComponentQuery | None = None,
         none_of: ComponentQuery | None = None,
-    ) -> Query:
-        query = Query(self, all_of, any_of, none_of)
+        *,
+        track_changes: bool = False,
+        lazy: bool = False,
+        sort_key: SortKey | None = None,
+    ) -> QueryHandle:
+        """
+        Get a Query over this Domain's entities.
+
+        Queries with the same component sets and options are shared: asking
+        for an equivalent query returns a new handle to the existing instance
+        and increments its reference count. Hooks registered through a
+        handle are removed when it is disposed. Call `dispose` on the handle
+        (or `release_query`) when done with it.
+
+        Parameters
+        ----------
+        all_of, optional
+            Component types an entity must have all of
+        any_of, optional
+            Component types an entity must have at least one of
+        none_of, optional
+            Component types an entity must have none of
+        track_changes, optional
+            Record per-tick added, removed and changed sets, by default False
+        lazy, optional
+            Defer membership updates until the query is next read, by default
+            False
+        sort_key, optional
+            Keep the result ordered by this function of each entity, by
+            default None. An entity is repositioned when it enters or when
+            one of its components is marked changed; queries are shared
+            only when they use the same key function object
+
+        Returns
+        -------
+            A handle to the shared Query instance
+        """
+        # Components from a lazy Loader get their cbit when first resolved.
+        for components in (all_of, any_of, none_of):
+            for component in components or ():
+                self.engine.components.resolve(component)
+
+        key = query_key(all_of, any_of, none_of, track_changes, lazy, sort_key)
+        if key in self._query_map:
+            query = self._query_map[key]
+            query._refs += 1
+            return QueryHandle(query)
+
+        query = Query(
+            self,
+            all_of,
+            any_of,
+            none_of,
+            track_changes=track_changes,
+            lazy=lazy,
+            sort_key=sort_key,
+        )
+        self._query_map[key] = query
         self.queries.append(query)
-        return query
+        return QueryHandle(query)
 
-    def candidate(self, entity: Entity) -> None:
+    def release_query(self, query: Query | QueryHandle) -> None:
+        """
+        Drop one reference to a Query obtained from `create_query`. Once no
+        references remain the Query stops being updated by the Domain.
+        """
+        if isinstance(query, QueryHandle):
+            query.dispose()
+            return
+        query._refs -= 1
+        if query._refs > 0:
+            return
+        if self._query_map.get(query.key) is query:
+            del self._query_map[query.key]
+        if query in self.queries:
+            self.queries.remove(query)
+
+    def candidate(self, entity: Entity, *, destroyed: bool = False) -> None:
+        profiler = self.profiler
+        if profiler is None:
+            for query in self.queries:
+                query.candidate(entity, destroyed=destroyed)
+            return
+
+        clock = profiler.clock
         for query in self.queries:
-            query.candidate(entity)
+            start = clock()
+            query.candidate(entity, destroyed=destroyed)
+            profiler.record_query(query, clock() - start)
+
+    def changed(self, entity: Entity) -> None:
+        if self.defer(lambda: self.changed(entity), entity):
+            return
+        for query in self.queries:
+            query.mark_changed(entity)
 
     def save(self, directory: Path, filename: str) -> None:
         output: dict[str, EntityDict] = {}
@@ -229,9 +555,7 @@ class Domain:
                 "components": [],
             }
 
-            for component in entity.components.values():
-                component_data = serialize_component(component)
-                output[entity.eid]["components"].append(component_data)
+            output[entity.eid]["components"] = serialize_entity(entity)
 
         write_to_file(directory, filename, output)
 
@@ -269,6 +593,20 @@ def load_from_file(directory: Path, filename: str) -> dict[str, EntityDict]:
         return json.loads(file.read())
 
 
+def serialize_entity(entity: Entity) -> list[ComponentDict]:
+    """
+    Serialize all of an entity's components, including tag components, which
+    have no instance and are written with empty data.
+    """
+    components = [
+        serialize_component(component)
+        for component in entity.components.values()
+    ]
+    for tag in entity.domain.engine.components.tags_of(entity):
+        components.append({"comp_id": tag.comp_id, "cbit": tag.cbit, "data": {}})
+    return components
+
+
 def serialize_component(component: Component) -> ComponentDict:
     """
     Serialization should provide all of the necessary information needed to
@@ -277,9 +615,12 @@ def serialize_component(component: Component) -> ComponentDict:
     """
     comp_id = component.__class__.comp_id
     cbit = component.__class__.cbit
-    instance_data = vars(component)
 
-    del instance_data["_entity_id"]
+    # Private bookkeeping such as the owning entity id and change tick is
+    # rebuilt on load, so only public instance state is written out.
+    instance_data = {
+        k: v for k, v in vars(component).items() if not k.startswith("_")
+    }
 
     return {
         "comp_id": comp_id,
@@ -3,18 +3,22 @@ from beartype import beartype
 from beartype.typing import TYPE_CHECKING
 from beartype.typing import cast
 from beartype.typing import Any
-from collections import OrderedDict
 
 if TYPE_CHECKING:
     from pecs_framework._types import CompId
     from pecs_framework.loader import Loader
+    from pecs_framework.memory import MemoryReport
+
+import sys
 
 from pecs_framework.component import ComponentMeta, Component
+from pecs_framework.component import reserve_cbit
 from pecs_framework.domain import Domain, EntityRegistry
 from pecs_framework.entity import add_component
 from pecs_framework.entity import add_component_type
 from pecs_framework.entity import Entity
 from pecs_framework.entity import has_component
+from pecs_framework.entity import mark_changed
 from pecs_framework.entity import remove_component
 from pecs_framework.prefab import PrefabBuilder
 
@@ -24,31 +28,90 @@ class ComponentRegistry:
     def __init__(self, engine: Engine) -> None:
         self._engine = engine
         self._cbits = 0
-        self._map: OrderedDict[CompId, ComponentMeta] = OrderedDict()
+        self._map: dict[CompId, ComponentMeta] = {}
+        self._tags: list[ComponentMeta] = []
+        # Components named by a lazy Loader's manifest but not imported yet,
+        # with the cbit reserved for them.
+        self._pending: dict[CompId, tuple[Loader, str, str, str, int]] = {}
+        self._pools: dict[CompId, list[Component]] = {}
+        self._pool_sizes: dict[CompId, int] = {}
 
     def load(self, pathspec: str) -> None:
         if self._engine._loader:
             loader = self._engine._loader
+            if loader.lazy:
+                self._reserve(loader, pathspec)
+                return
             loader.load(pathspec)
             for component in loader.components:
                 self.register(component)
 
+    def _reserve(self, loader: Loader, pathspec: str) -> None:
+        # Register names and cbits from the manifest; modules are imported by
+        # `resolve` when a component is first used.
+        for name, module_name in loader.manifest().items():
+            key = name.upper()
+            if key in self._map or key in self._pending:
+                continue
+            self._pending[key] = (loader, pathspec, name, module_name, self._cbits)
+            module = f"{pathspec}.{module_name}"
+            reserve_cbit(module, name, self._cbits)
+            self._cbits += 1
+            # A class imported before its package was loaded already exists
+            # without its reserved cbit.
+            if module in sys.modules and name in vars(sys.modules[module]):
+                self.register(vars(sys.modules[module])[name])
+
     @beartype
     def register(self, component: ComponentMeta) -> None:
         key = component.__name__.upper()
         if key in self._map.keys():
             return
-        component.cbit = self._cbits
+        if key in self._pending:
+            component.cbit = self._pending.pop(key)[4]
+        else:
+            component.cbit = self._cbits
+            self._cbits += 1
         self._map[key] = component
-        self._cbits += 1
+        if component.is_tag:
+            self._tags.append(component)
+
+    @property
+    def tags(self) -> list[ComponentMeta]:
+        """Registered tag component types."""
+        return self._tags
+
+    def tags_of(self, entity: Entity) -> list[ComponentMeta]:
+        """The tag component types currently set on an entity."""
+        return [tag for tag in self._tags if has_component(entity, tag)]
+
+    def names(self) -> list[CompId]:
+        """Ids of every registered component, imported or not."""
+        return [*self._map.keys(), *self._pending.keys()]
+
+    def resolve(self, component: ComponentMeta | str) -> ComponentMeta:
+        """
+        Look up a registered component type, importing it first if it was
+        registered by a lazy Loader and has not been used yet.
+        """
+        if isinstance(component, str):
+            key: CompId = component.upper()
+            found = self._map.get(key)
+            if found is not None:
+                return found
+            if key not in self._pending:
+                raise KeyError(key)
+            loader, pathspec, name, module_name, _ = self._pending[key]
+            component = loader.import_component(pathspec, name, module_name)
+        if self._pending and component.comp_id in self._pending:
+            self.register(component)
+        return component
 
     @beartype
     def get_type(self, key: ComponentMeta | str) -> type[Component]:
         if isinstance(key, str):
-            _key: CompId = key.upper()
-        else:
-            _key = key.comp_id
-        return cast(type[Component], self._map[_key])
+            return cast(type[Component], self.resolve(key))
+        return cast(type[Component], self._map[self.resolve(key).comp_id])
 
     @beartype
     def attach(
@@ -80,12 +143,26 @@ class ComponentRegistry:
         properties, optional
             A dict of arguments to pass to a Component class, by default None
         """
+        if entity.domain.defer(
+            lambda: self.attach(entity, component, properties),
+            entity,
+        ):
+            return
+
         if isinstance(component, str):
-            component = self._map[component.upper()]
+            component = self.resolve(component)
 
         if isinstance(component, ComponentMeta):
+            if self._pending:
+                self.resolve(component)
             properties_ = properties if properties else {}
-            add_component_type(entity, component, properties_)
+            pool = self._pools.get(component.comp_id)
+            if pool:
+                instance = pool.pop()
+                instance.reset(**properties_)
+                add_component(entity, instance)
+            else:
+                add_component_type(entity, component, properties_)
         else:
             add_component(entity, component)
 
@@ -95,18 +172,84 @@ class ComponentRegistry:
         entity: Entity,
         component: ComponentMeta | str | Component
     ) -> None:
+        if entity.domain.defer(lambda: self.remove(entity, component), entity):
+            return
+
         if not isinstance(component, ComponentMeta):
             if isinstance(component, str):
-                component = self._map[component.upper()]
+                component = self.resolve(component)
             else:
                 component = component.__class__
 
+        instance = entity.components.get(component.comp_id)
+        shared = component.comp_id in entity._shared
         remove_component(entity, component)
+        if instance is not None and not shared:
+            self.recycle(instance)
+
+    @beartype
+    def enable_pool(
+        self,
+        component: ComponentMeta | str,
+        max_size: int,
+    ) -> None:
+        """
+        Keep up to `max_size` removed instances of a Component type for reuse
+        when that type is attached again. Pooled instances are reinitialized
+        through `Component.reset`.
+
+        Parameters
+        ----------
+        component
+            A ComponentType or Component name
+        max_size
+            Maximum number of idle instances to keep
+        """
+        comp_id = self.get_type(component).comp_id
+        self._pool_sizes[comp_id] = max_size
+        pool = self._pools.setdefault(comp_id, [])
+        del pool[max_size:]
+
+    def recycle(self, instance: Component) -> None:
+        """Return a detached Component instance to its type's pool, if any."""
+        comp_id = instance.__class__.comp_id
+        pool = self._pools.get(comp_id)
+        if pool is None or len(pool) >= self._pool_sizes[comp_id]:
+            return
+        instance._entity_id = ''
+        pool.append(instance)
+
+    @beartype
+    def mark_changed(
+        self,
+        entity: Entity,
+        component: ComponentMeta | str | Component,
+    ) -> None:
+        """
+        Record that an attached Component was modified during the current
+        Domain tick.
+
+        Parameters
+        ----------
+        entity
+            The Entity that owns the Component
+        component
+            A ComponentType, Component instance, or a Component name
+        """
+        if not isinstance(component, ComponentMeta):
+            if isinstance(component, str):
+                component = self.resolve(component)
+            else:
+                component = component.__class__
+
+        mark_changed(entity, component)
 
     @beartype
     def has(self, entity: Entity, component_type: ComponentMeta) -> bool:
         if not entity:
             return False
+        if self._pending:
+            self.resolve(component_type)
         return has_component(entity, component_type)
 
 
@@ -160,6 +303,17 @@ class Engine:
         self._prefabs = PrefabBuilder(self)
         return self.domain
 
+    def memory_report(self) -> dict[str, MemoryReport]:
+        """
+        Estimate the memory used by each Domain on this Engine.
+
+        Returns
+        -------
+            A MemoryReport per Domain name
+        """
+        from pecs_framework.memory import engine_memory
+        return engine_memory(self)
+
     def change_domain(self, domain_name: str) -> Domain:
         domain = self._domains[domain_name]
         self._domain = self._domains[domain_name]
@@ -3,33 +3,55 @@ from beartype import beartype
 from beartype.typing import TYPE_CHECKING
 from beartype.typing import Any
 from beartype.typing import cast
-from collections import OrderedDict
 
 if TYPE_CHECKING:
     from pecs_framework._types import CompId
+    from pecs_framework.archetype import Archetype
     from pecs_framework.domain import Domain
     from .entity import Entity
 
+import itertools
 import json
 from pecs_framework.events import EventData, EntityEvent
-from pecs_framework.utils import has_bit
-from pecs_framework.utils import subtract_bit
-from pecs_framework.utils import add_bit
 from pecs_framework.component import Component
 from pecs_framework.component import ComponentMeta
 from pecs_framework.component import CT
 
 
+# Creation order of entities, used to list query results in the order the
+# entities were created regardless of how they are grouped by Archetype.
+_sequence = itertools.count()
+
+
 class Entity:
+    # Ids of components whose instances are shared with a forked Domain and
+    # must be copied before this entity hands them out. See `Domain.fork`.
+    _shared: set[CompId] | frozenset[CompId] = frozenset()
 
     @beartype
     def __init__(self, domain, entity_id: str = '') -> None:
         self.domain = domain
         self.eid = entity_id
-        self.cbits: int = 0
-        self.components: OrderedDict[CompId, Component] = OrderedDict()
+        self.seq: int = next(_sequence)
+        self.archetype: Archetype = domain.archetypes.empty
+        self.archetype.entities[self] = None
+        self.components: dict[CompId, Component] = {}
         self.qeligible: bool = True
 
+    @property
+    def cbits(self) -> int:
+        """Bitmask of the component types attached to this entity."""
+        return self.archetype.mask
+
+    @cbits.setter
+    def cbits(self, value: int) -> None:
+        self._move(self.domain.archetypes.intern(value))
+
+    def _move(self, archetype: Archetype) -> None:
+        del self.archetype.entities[self]
+        archetype.entities[self] = None
+        self.archetype = archetype
+
     def __getitem__(self, component: type[CT] | str) -> CT:
         if isinstance(component, str):
             _component = self.domain.engine.components.get_type(component)
@@ -76,12 +98,26 @@ class Entity:
             data = {}
         evt = EntityEvent(event, data)
 
-        for component in self.components.values():
-            component.handle_event(evt)
-            if evt.prevented:
-                return evt
+        profiler = self.domain.profiler
+        if profiler is None:
+            return dispatch_event(self, evt)
+
+        start = profiler.clock()
+        dispatch_event(self, evt)
+        profiler.record_event(event, profiler.clock() - start)
         return evt
 
+    def mark_changed(self, component: type[Component] | str) -> None:
+        """
+        Flag one of this entity's components as modified during the current
+        Domain tick so change-tracking queries can pick it up.
+        """
+        if isinstance(component, str):
+            _component = self.domain.engine.components.get_type(component)
+        else:
+            _component = component
+        mark_changed(self, _component)
+
     def on_component_added(self):
         pass
 
@@ -100,16 +136,37 @@ class Entity:
         self.on_component_removed()
 
     def _on_entity_destroyed(self):
+        # Drop out of every query first so exit hooks can still read the
+        # entity's components.
+        self._move(self.domain.archetypes.empty)
+        candidacy(self.domain, self, destroyed=True)
+
         to_delete = []
         for component in self.components.values():
             to_delete.append(component)
 
+        registry = self.domain.engine.components
         for component in to_delete:
-            self.components[component.comp_id]._entity_id = ''
             del self.components[component.comp_id]
+            if component.comp_id in self._shared:
+                continue
+            component._entity_id = ''
+            registry.recycle(component)
+        self._shared = frozenset()
 
+        del self.archetype.entities[self]
         self.on_entity_destroyed()
 
+    def _reset(self, entity_id: str) -> None:
+        # Prepare a pooled Entity to be handed out again by the registry.
+        self.eid = entity_id
+        self.seq = next(_sequence)
+        self.archetype = self.domain.archetypes.empty
+        self.archetype.entities[self] = None
+        self.components.clear()
+        self._shared = frozenset()
+        self.qeligible = True
+
 
 def add_component_type(
     entity: Entity,
@@ -131,7 +188,10 @@ def add_component_type(
     properties, optional
         Parameter dict for Component class instantiation, by default None
     """
-    entity.cbits = add_bit(entity.cbits, component.cbit)
+    entity._move(entity.archetype.with_bit(component.cbit))
+    if component.is_tag:
+        entity._on_component_added()
+        return
     if properties:
         entity.components[component.comp_id] = component(**properties)
     else:
@@ -151,7 +211,10 @@ def add_component(entity: Entity, component: Component) -> None:
     component
         The Component instance to add to the Entity
     """
-    entity.cbits = add_bit(entity.cbits, component.__class__.cbit)
+    entity._move(entity.archetype.with_bit(component.__class__.cbit))
+    if component.__class__.is_tag:
+        entity._on_component_added()
+        return
     entity.components[component.__class__.comp_id] = component
     component._entity_id = entity.eid
     entity._on_component_added()
@@ -159,36 +222,92 @@ def add_component(entity: Entity, component: Component) -> None:
 
 def remove_component(entity: Entity, component_type: ComponentMeta) -> None:
     comp_id: CompId = component_type.comp_id
+    if component_type.is_tag:
+        entity._move(entity.archetype.without_bit(component_type.cbit))
+        entity._on_component_removed()
+        return
     instance = entity.components[comp_id]
-    entity.cbits = subtract_bit(entity.cbits, component_type.cbit)
+    entity._move(entity.archetype.without_bit(component_type.cbit))
     entity._on_component_removed()
     del entity.components[comp_id]
+    if comp_id in entity._shared:
+        entity._shared.discard(comp_id)
     del instance
 
 
+def mark_changed(entity: Entity, component_type: ComponentMeta) -> None:
+    """
+    Stamp an attached Component with the Domain's current tick and notify the
+    Domain's queries that the entity changed.
+
+    Parameters
+    ----------
+    entity
+        The Entity that owns the Component
+    component_type
+        The type of the Component that was modified
+    """
+    instance = unshare(entity, component_type.comp_id)
+    instance._changed_tick = entity.domain.tick
+    entity.domain.changed(entity)
+
+
 def owns_component(entity: Entity, component: Component) -> bool:
     return component.entity_id == entity.eid
 
 
 def has_component(entity: Entity, component_type: ComponentMeta) -> bool:
-    return has_bit(entity.cbits, component_type.cbit)
+    return component_type.cbit in entity.archetype.bits
 
 
 def get_component(entity: Entity, component_type: type[CT]) -> CT:
+    if isinstance(component_type, str):
+        comp_id = component_type.title()
+    else:
+        comp_id = component_type.comp_id
+    if comp_id in entity._shared:
+        return cast(CT, unshare(entity, comp_id))
     try:
-        if isinstance(component_type, str):
-            component = entity.components[component_type.title()]
-        else:
-            component = entity.components[component_type.comp_id]
-        return cast(CT, component)
-    except Exception as exc:
+        return cast(CT, entity.components[comp_id])
+    except KeyError as exc:
         exc.add_note("Component was not found in the entity's component list.")
         raise
 
 
-def candidacy(domain: Domain, entity: Entity) -> None:
+def unshare(entity: Entity, comp_id: CompId) -> Component:
+    """
+    Give an entity of a forked Domain its own copy of a component it still
+    shares with the parent, so that it can be modified without affecting the
+    parent. Fields referencing the parent's entities are pointed at the
+    forked Domain's entities with the same ids.
+    """
+    component = entity.components[comp_id]
+    if comp_id in entity._shared:
+        component = component.copy()
+        for name, value in vars(component).items():
+            if isinstance(value, Entity) and value.domain is not entity.domain:
+                twin = entity.domain.entities._map.get(value.eid)
+                if twin is not None:
+                    setattr(component, name, twin)
+        entity.components[comp_id] = component
+        entity._shared.discard(comp_id)
+    return component
+
+
+def dispatch_event(entity: Entity, evt: EntityEvent) -> EntityEvent:
+    # Handlers may modify their component.
+    for comp_id in list(entity._shared):
+        unshare(entity, comp_id)
+    for component in entity.components.values():
+        component.handle_event(evt)
+        if evt.prevented:
+            return evt
+    return evt
+
+
+def candidacy(domain: Domain, entity: Entity, destroyed: bool = False) -> None:
     if entity.qeligible:
-        domain.candidate(entity)
+        domain.candidate(entity, destroyed=destroyed)
 
 
 def serialize_component(component: Component) -> str:
@@ -3,17 +3,44 @@ from beartype.typing import TYPE_CHECKING
 if TYPE_CHECKING:
     from pecs_framework.component import Component
 
+import ast
+import json
 import os
 from importlib import import_module
+from pathlib import Path
 
 
 class Loader:
+    """
+    Discovers Component classes in a package, one class per module, where
+    the class name lowercased matches the module name without underscores.
 
-    def __init__(self, file: str) -> None:
-        here = os.path.dirname(os.path.abspath(file))
-        self.tree = os.listdir(here)
-        self.tree.remove("__init__.py")
-        self.tree.remove("__pycache__")
+    By default `load` imports every module of the package. With `lazy=True`
+    it only reads the module sources to build a manifest of component name
+    to module, and the ComponentRegistry imports a module the first time its
+    component is resolved. Passing `manifest` caches that listing in a JSON
+    file, which is reused for as long as the modules are unchanged. A lazy
+    component class imported directly still gets the cbit reserved for it.
+
+    ```py
+    loader = Loader(__file__, lazy=True, manifest="components.json")
+    ```
+    """
+
+    def __init__(
+        self,
+        file: str,
+        *,
+        lazy: bool = False,
+        manifest: str | Path | None = None,
+    ) -> None:
+        self.here = os.path.dirname(os.path.abspath(file))
+        self.tree = sorted(
+            name for name in os.listdir(self.here)
+            if name.endswith(".py") and name != "__init__.py"
+        )
+        self.lazy = lazy
+        self.manifest_path = Path(manifest) if manifest else None
 
         self._components = []
 
@@ -26,7 +53,51 @@ class Loader:
             file_name = file.replace(".py", "")
             module_name = file_name.replace("_", "")
 
-            module = import_module("." + module_name, pathspec)
+            module = import_module("." + file_name, pathspec)
             for key in vars(module).keys():
                 if key.lower() == module_name:
                     self._components.append(vars(module)[key])
+
+    def manifest(self) -> dict[str, str]:
+        """
+        Map each component class name in the package to the module that
+        defines it, without importing anything.
+        """
+        stamps = {
+            file: os.stat(os.path.join(self.here, file)).st_mtime_ns
+            for file in self.tree
+        }
+        cached = self._read_manifest()
+        if cached is not None and cached.get("files") == stamps:
+            return cached["components"]
+
+        components = {}
+        for file in self.tree:
+            file_name = file.replace(".py", "")
+            with open(os.path.join(self.here, file)) as source:
+                tree = ast.parse(source.read(), file)
+            for node in tree.body:
+                if (
+                    isinstance(node, ast.ClassDef)
+                    and node.name.lower() == file_name.replace("_", "")
+                ):
+                    components[node.name] = file_name
+
+        if self.manifest_path is not None:
+            self.manifest_path.write_text(json.dumps(
+                {"files": stamps, "components": components},
+                indent=4,
+            ))
+        return components
+
+    def import_component(self, pathspec: str, name: str, module_name: str):
+        module = import_module("." + module_name, pathspec)
+        return vars(module)[name]
+
+    def _read_manifest(self) -> dict | None:
+        if self.manifest_path is None or not self.manifest_path.exists():
+            return None
+        try:
+            return json.loads(self.manifest_path.read_text())
+        except ValueError:
+            return None
@@ -0,0 +1,163 @@
+from __future__ import annotations
+from beartype.typing import TYPE_CHECKING
+from beartype.typing import Any
+
+if TYPE_CHECKING:
+    from pecs_framework.engine import ComponentRegistry
+    from pecs_framework.engine import Engine
+
+from dataclasses import dataclass, field
+import sys
+
+from pecs_framework.archetype import Archetype
+from pecs_framework.component import Component
+from pecs_framework.domain import Domain
+from pecs_framework.entity import Entity
+from pecs_framework.query import Query
+from pecs_framework.query import QueryHandle
+
+
+# Objects that are referenced from component or query state but are owned
+# elsewhere, and so are never counted as part of the referencing object.
+_OWNED_ELSEWHERE = (
+    Archetype, Domain, Entity, Component, Query, QueryHandle, type,
+)
+
+
+def deep_sizeof(obj: Any, seen: set[int] | None = None) -> int:
+    """
+    Estimate the bytes held by an object and the containers and values it
+    references, counting each object at most once.
+
+    Entities, components and classes reached from `obj` are treated as
+    references and not descended into.
+    """
+    seen = seen if seen is not None else set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            size += _ref_sizeof(key, seen) + _ref_sizeof(value, seen)
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        for item in obj:
+            size += _ref_sizeof(item, seen)
+    elif hasattr(obj, "__dict__"):
+        size += deep_sizeof(vars(obj), seen)
+    return size
+
+
+def _ref_sizeof(obj: Any, seen: set[int]) -> int:
+    if isinstance(obj, _OWNED_ELSEWHERE):
+        return 0
+    return deep_sizeof(obj, seen)
+
+
+@dataclass
+class UsageStat:
+    count: int = 0
+    bytes: int = 0
+
+    @property
+    def mean(self) -> float:
+        return self.bytes / self.count if self.count else 0.0
+
+
+@dataclass
+class MemoryReport:
+    """Approximate memory use of one Domain, in bytes."""
+    entities: UsageStat = field(default_factory=UsageStat)
+    components: dict[str, UsageStat] = field(default_factory=dict)
+    queries: dict[str, UsageStat] = field(default_factory=dict)
+    registries: dict[str, UsageStat] = field(default_factory=dict)
+
+    @property
+    def total(self) -> int:
+        return (
+            self.entities.bytes
+            + sum(stat.bytes for stat in self.components.values())
+            + sum(stat.bytes for stat in self.queries.values())
+            + sum(stat.bytes for stat in self.registries.values())
+        )
+
+    def largest_components(self, n: int = 5) -> list[tuple[str, UsageStat]]:
+        ranked = sorted(self.components.items(), key=lambda kv: -kv[1].bytes)
+        return ranked[:n]
+
+    def as_dict(self) -> dict[str, Any]:
+        def dump(stat: UsageStat) -> dict[str, Any]:
+            return {"count": stat.count, "bytes": stat.bytes, "mean": stat.mean}
+
+        return {
+            "total": self.total,
+            "entities": dump(self.entities),
+            "components": {k: dump(v) for k, v in self.components.items()},
+            "queries": {k: dump(v) for k, v in self.queries.items()},
+            "registries": {k: dump(v) for k, v in self.registries.items()},
+        }
+
+
+def domain_memory(
+    domain: Domain,
+    registry: ComponentRegistry | None = None,
+) -> MemoryReport:
+    """
+    Estimate how much memory a Domain's entities, components, queries and
+    registry maps use. `registry` defaults to the engine's current
+    ComponentRegistry.
+
+    Entity figures cover the Entity object and its component map; component
+    instances are reported per type. Shared values are counted once, against
+    whichever object reaches them first.
+    """
+    report = MemoryReport()
+    seen: set[int] = set()
+
+    for entity in domain.entities:
+        size = sys.getsizeof(entity) + deep_sizeof(vars(entity), seen)
+        report.entities.count += 1
+        report.entities.bytes += size
+
+        for comp_id, component in entity.components.items():
+            stat = report.components.setdefault(comp_id, UsageStat())
+            stat.count += 1
+            stat.bytes += deep_sizeof(component, seen)
+
+    for query in domain.queries:
+        size = (
+            deep_sizeof(query._cache, seen)
+            + deep_sizeof(query._indices, seen)
+            + deep_sizeof(query._added, seen)
+            + deep_sizeof(query._removed, seen)
+            + deep_sizeof(query._changed, seen)
+            + deep_sizeof(query._dirty, seen)
+        )
+        stat = report.queries.setdefault(query.label, UsageStat())
+        stat.count += len(query._cache)
+        stat.bytes += size
+
+    entities = domain.entities
+    registry = registry if registry is not None else domain.engine.components
+    registry_maps = {
+        "entities": entities._map,
+        "alias_to_eid": entities.alias_to_eid,
+        "eid_to_alias": entities.eid_to_alias,
+        "components": registry._map,
+    }
+    for name, mapping in registry_maps.items():
+        report.registries[name] = UsageStat(
+            count=len(mapping),
+            bytes=deep_sizeof(mapping, seen),
+        )
+
+    return report
+
+
+def engine_memory(engine: Engine) -> dict[str, MemoryReport]:
+    """Memory reports for every Domain created on an Engine, by name."""
+    return {
+        name: domain_memory(domain, engine._registries[name])
+        for name, domain in engine._domains.items()
+    }
@@ -0,0 +1,50 @@
+from __future__ import annotations
+from beartype.typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from pecs_framework.domain import Domain
+    from pecs_framework.engine import Engine
+
+from concurrent.futures import ThreadPoolExecutor
+
+from pecs_framework.base_system import Loop
+
+
+class ThreadedLoop(Loop):
+    """
+    A Loop that runs the non-conflicting systems of each scheduler stage on a
+    thread pool.
+
+    Systems still run stage by stage, and any component attach/remove or
+    entity destruction they request is applied once the whole stage is done.
+    Subclasses only need to implement `initialize` to create their systems.
+    """
+
+    def __init__(
+        self,
+        ecs: Engine,
+        domain: Domain,
+        max_workers: int | None = None,
+    ) -> None:
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix="pecs-system",
+        )
+        super().__init__(ecs, domain)
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        return self._executor
+
+    def teardown(self) -> None:
+        super().teardown()
+        self._executor.shutdown(wait=True)
+
+    def pre_update(self) -> None:
+        pass
+
+    def update(self) -> None:
+        self.scheduler.run(self._executor)
+
+    def post_update(self) -> None:
+        pass
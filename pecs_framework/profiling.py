@@ -0,0 +1,143 @@
+from __future__ import annotations
+from beartype.typing import TYPE_CHECKING
+from beartype.typing import Any
+from beartype.typing import Callable
+
+if TYPE_CHECKING:
+    from pecs_framework.domain import Domain
+    from pecs_framework.query import Query
+    from pecs_framework.query import QueryKey
+
+from collections import Counter
+from dataclasses import dataclass, asdict
+from pathlib import Path
+import json
+import time
+
+
+@dataclass
+class TimingStat:
+    calls: int = 0
+    total: float = 0.0
+    max: float = 0.0
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.calls if self.calls else 0.0
+
+    def record(self, elapsed: float) -> None:
+        self.calls += 1
+        self.total += elapsed
+        if elapsed > self.max:
+            self.max = elapsed
+
+
+class Profiler:
+    """
+    Collects per-system, per-query and per-event statistics for a Domain.
+
+    Attach one with `Domain.enable_profiling`. While no profiler is attached,
+    the instrumented code paths only pay for a single attribute check.
+
+    Query statistics cover candidacy checks and the reconciling of lazy
+    queries. They are kept per query, by `Query.key`, and reported under the
+    query's label, numbered when several queries share one label.
+
+    Updates from systems running concurrently on a ThreadedLoop are not
+    synchronized, so counts may be slightly off in that case.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.perf_counter) -> None:
+        self.clock = clock
+        self.systems: dict[str, TimingStat] = {}
+        self.queries: dict[QueryKey, TimingStat] = {}
+        self.query_labels: dict[QueryKey, str] = {}
+        self.events: Counter[str] = Counter()
+        self.event_times: dict[str, TimingStat] = {}
+
+    def reset(self) -> None:
+        self.systems.clear()
+        self.queries.clear()
+        self.query_labels.clear()
+        self.events.clear()
+        self.event_times.clear()
+
+    def record_system(self, name: str, elapsed: float) -> None:
+        self._stat(self.systems, name).record(elapsed)
+
+    def record_query(self, query: Query, elapsed: float) -> None:
+        key = query.key
+        stat = self.queries.get(key)
+        if stat is None:
+            stat = self.queries[key] = TimingStat()
+            self.query_labels[key] = query.label
+        stat.record(elapsed)
+
+    def record_event(self, name: str, elapsed: float) -> None:
+        self.events[name] += 1
+        self._stat(self.event_times, name).record(elapsed)
+
+    def snapshot(self, domain: Domain) -> dict[str, Any]:
+        """
+        Gather the collected statistics together with the Domain's current
+        entity, component and query counts.
+        """
+        components: Counter[str] = Counter()
+        for entity in domain.entities:
+            components.update(entity.components.keys())
+
+        labels = dict(self.query_labels)
+        for query in domain.queries:
+            labels.setdefault(query.key, query.label)
+        names = self._query_names(labels)
+
+        return {
+            "tick": domain.tick,
+            "entities": len(domain.entities.keys()),
+            "components": dict(components),
+            "queries": {
+                "count": len(domain.queries),
+                "results": {
+                    names[q.key]: len(q._cache) for q in domain.queries
+                },
+                "updates": {
+                    names[key]: {**asdict(stat), "mean": stat.mean}
+                    for key, stat in self.queries.items()
+                },
+            },
+            "systems": self._dump(self.systems),
+            "events": {
+                name: {"count": count, **asdict(self.event_times[name])}
+                for name, count in self.events.items()
+            },
+        }
+
+    def dump(self, domain: Domain, path: str | Path) -> None:
+        with open(path, "w") as file:
+            file.write(json.dumps(self.snapshot(domain), indent=4))
+
+    @staticmethod
+    def _query_names(labels: dict[QueryKey, str]) -> dict[QueryKey, str]:
+        # Distinct queries can share a label, e.g. two sort keys with the
+        # same function name, so repeated labels are numbered.
+        names: dict[QueryKey, str] = {}
+        seen: Counter[str] = Counter()
+        for key, label in labels.items():
+            seen[label] += 1
+            count = seen[label]
+            names[key] = label if count == 1 else f"{label} #{count}"
+        return names
+
+    @staticmethod
+    def _stat(stats: dict[str, TimingStat], name: str) -> TimingStat:
+        stat = stats.get(name)
+        if stat is None:
+            stat = stats[name] = TimingStat()
+        return stat
+
+    @staticmethod
+    def _dump(stats: dict[str, TimingStat]) -> dict[str, dict[str, Any]]:
+        return {
+            name: {**asdict(stat), "mean": stat.mean}
+            for name, stat in stats.items()
+        }
@@ -1,14 +1,24 @@
 from __future__ import annotations
 from beartype.typing import TYPE_CHECKING
 from beartype.typing import Sequence
+from beartype.typing import KeysView
 from beartype.typing import Any
+from beartype.typing import Callable
+from beartype.typing import TypeVar
 from typing import TypeAlias
 
 if TYPE_CHECKING:
+    from concurrent.futures import Executor
+    from pecs_framework.archetype import Archetype
     from pecs_framework.entity import Entity
     from pecs_framework.domain import Domain
 
+from bisect import bisect_left, bisect_right
 from functools import reduce
+from operator import attrgetter
+import itertools
+import os
+import threading
 
 from pecs_framework.component import ComponentMeta
 from pecs_framework.utils import add_bit
@@ -16,6 +26,54 @@ from pecs_framework.utils import bit_intersection
 
 
 ComponentQuery: TypeAlias = list[ComponentMeta]
+QueryHook: TypeAlias = Callable[["Entity"], Any]
+SortKey: TypeAlias = Callable[["Entity"], Any]
+QueryKey: TypeAlias = tuple[int, int, int, bool, bool, SortKey | None]
+R = TypeVar("R")
+
+
+def component_mask(components: ComponentQuery | None) -> int:
+    components = components if components is not None else []
+    return reduce(lambda a, b: add_bit(a, b.cbit), components, 0)
+
+
+def query_key(
+    all_of: ComponentQuery | None = None,
+    any_of: ComponentQuery | None = None,
+    none_of: ComponentQuery | None = None,
+    track_changes: bool = False,
+    lazy: bool = False,
+    sort_key: SortKey | None = None,
+) -> QueryKey:
+    return (
+        component_mask(all_of),
+        component_mask(any_of),
+        component_mask(none_of),
+        track_changes,
+        lazy,
+        sort_key,
+    )
+
+
+def query_label(
+    all_of: ComponentQuery | None = None,
+    any_of: ComponentQuery | None = None,
+    none_of: ComponentQuery | None = None,
+    sort_key: SortKey | None = None,
+    track_changes: bool = False,
+    lazy: bool = False,
+) -> str:
+    parts = []
+    for name, components in (("all", all_of), ("any", any_of), ("none", none_of)):
+        if components:
+            parts.append(f"{name}_of={[c.__name__ for c in components]}")
+    if sort_key is not None:
+        parts.append(f"sort_key={getattr(sort_key, '__name__', sort_key)}")
+    if track_changes:
+        parts.append("track_changes=True")
+    if lazy:
+        parts.append("lazy=True")
+    return ", ".join(parts)
 
 
 class Query:
@@ -26,54 +84,580 @@ class Query:
         all_of: ComponentQuery | None = None,
         any_of: ComponentQuery | None = None,
         none_of: ComponentQuery | None = None,
+        *,
+        track_changes: bool = False,
+        lazy: bool = False,
+        sort_key: SortKey | None = None,
     ) -> None:
         self._domain = domain
+        self._track_changes = track_changes
+        self._lazy = lazy
+        self._sort_key = sort_key
+        self._label = query_label(
+            all_of,
+            any_of,
+            none_of,
+            sort_key,
+            track_changes,
+            lazy,
+        )
+
+        self._all = component_mask(all_of)
+        self._any = component_mask(any_of)
+        self._none = component_mask(none_of)
 
-        all_of = all_of if all_of is not None else []
-        any_of = any_of if any_of is not None else []
-        none_of = none_of if none_of is not None else []
+        # Match verdict per Archetype id of the Domain's ArchetypeTable, so the
+        # mask arithmetic runs once per distinct component set.
+        self._verdicts: dict[int, bool] = {}
 
-        self._all = reduce(lambda a, b: add_bit(a, b.cbit), all_of, 0)
-        self._any = reduce(lambda a, b: add_bit(a, b.cbit), any_of, 0)
-        self._none = reduce(lambda a, b: add_bit(a, b.cbit), none_of, 0)
+        # Number of holders sharing this instance through `Domain.create_query`.
+        self._refs: int = 1
 
         self._cache: list[Entity] = []
         self._indices: dict[Entity, int] = {}
-        self.refresh()
+
+        # Sorted queries keep `_cache` ordered by `sort_key`, with a
+        # (key, arrival) pair for each entry in the parallel `_keys` list for
+        # bisection. The arrival number breaks ties, so equal keys keep
+        # arrival order and every entry can be found by bisection alone.
+        # Their `_indices` maps each member to its pair instead of a position.
+        self._keys: list[tuple[Any, int]] = []
+        self._arrivals = itertools.count()
+
+        # Insertion-ordered sets of entities that entered, left, or had a
+        # component marked changed since the last call to `clear_changes`.
+        self._added: dict[Entity, None] = {}
+        self._removed: dict[Entity, None] = {}
+        self._changed: dict[Entity, None] = {}
+
+        self._enter_hooks: list[QueryHook] = []
+        self._exit_hooks: list[QueryHook] = []
+        self._change_hooks: list[QueryHook] = []
+
+        # Lazy queries only record candidates here and evaluate them the next
+        # time the query is read. `_stale` defers the initial full scan too.
+        self._dirty: dict[Entity, None] = {}
+        self._stale: bool = lazy
+        self._lock = threading.RLock()
+        if not lazy:
+            self.refresh()
+
+    def __repr__(self) -> str:
+        return f"Query({self._label})"
+
+    @property
+    def label(self) -> str:
+        """Readable description of the query's component sets."""
+        return self._label
 
     @property
     def result(self) -> Sequence[Entity]:
+        if self._lazy:
+            self.reconcile()
         return self._cache
 
+    @property
+    def lazy(self) -> bool:
+        return self._lazy
+
+    @property
+    def dirty(self) -> bool:
+        return self._stale or bool(self._dirty)
+
+    @property
+    def track_changes(self) -> bool:
+        return self._track_changes
+
+    @property
+    def sort_key(self) -> SortKey | None:
+        return self._sort_key
+
+    @property
+    def key(self) -> QueryKey:
+        """Canonical identity used by the Domain to share equivalent queries."""
+        return (
+            self._all,
+            self._any,
+            self._none,
+            self._track_changes,
+            self._lazy,
+            self._sort_key,
+        )
+
+    @property
+    def refs(self) -> int:
+        return self._refs
+
+    @property
+    def disposed(self) -> bool:
+        return self._refs <= 0
+
+    def dispose(self) -> None:
+        """
+        Release this holder's reference to the query. When the last reference
+        is released the Domain stops maintaining it and its caches and hooks
+        are dropped.
+        """
+        if self.disposed:
+            return
+        self._domain.release_query(self)
+        if self.disposed:
+            self._cache = []
+            self._keys = []
+            self._indices = {}
+            self._dirty = {}
+            self._enter_hooks.clear()
+            self._exit_hooks.clear()
+            self._change_hooks.clear()
+            self.clear_changes()
+
+    @property
+    def added(self) -> KeysView[Entity]:
+        """Entities that started matching this query during the current tick."""
+        if self._lazy:
+            self.reconcile()
+        return self._added.keys()
+
+    @property
+    def removed(self) -> KeysView[Entity]:
+        """Entities that stopped matching this query during the current tick."""
+        if self._lazy:
+            self.reconcile()
+        return self._removed.keys()
+
+    @property
+    def changed(self) -> KeysView[Entity]:
+        """
+        Matching entities that had a component marked changed during the
+        current tick.
+        """
+        if self._lazy:
+            self.reconcile()
+        return self._changed.keys()
+
+    def changed_of(self, component_type: ComponentMeta) -> list[Entity]:
+        """
+        Filter `changed` down to the entities whose instance of
+        `component_type` was marked changed during the current tick.
+        """
+        tick = self._domain.tick
+        comp_id = component_type.comp_id
+        return [
+            entity for entity in self.changed
+            if comp_id in entity.components
+            and entity.components[comp_id].changed_tick == tick
+        ]
+
+    def chunks(self, chunk_size: int) -> list[list[Entity]]:
+        """Split the current result into consecutive lists of `chunk_size`."""
+        result = self.result
+        return [
+            list(result[i:i + chunk_size])
+            for i in range(0, len(result), chunk_size)
+        ]
+
+    def map_chunks(
+        self,
+        fn: Callable[[list[Any]], R],
+        chunk_size: int | None = None,
+        *,
+        executor: Executor | None = None,
+        extract: Callable[[Entity], Any] | None = None,
+    ) -> list[R]:
+        """
+        Apply `fn` to chunks of the query result in parallel and return the
+        per-chunk results in order.
+
+        Structural changes made by `fn` are deferred and applied once every
+        chunk has been processed. If chunks fail, the others still run to
+        completion, then the first failure is raised and the changes are
+        discarded.
+
+        Parameters
+        ----------
+        fn
+            Function receiving one chunk (a list of entities, or of whatever
+            `extract` returns)
+        chunk_size, optional
+            Entities per chunk, by default the result split evenly across the
+            machine's CPUs
+        executor, optional
+            Executor to submit chunks to, by default a temporary thread pool.
+            A ProcessPoolExecutor requires `fn` to be picklable and `extract`
+            to produce picklable data
+        extract, optional
+            Function run in this process to turn each entity into the data
+            handed to `fn`, by default the entity itself
+
+        Returns
+        -------
+            One result per chunk, in result order
+        """
+        workers = os.cpu_count() or 1
+        if chunk_size is None:
+            chunk_size = max(1, -(-len(self.result) // workers))
+
+        chunks: list[list[Any]] = self.chunks(chunk_size)
+        if extract is not None:
+            chunks = [[extract(entity) for entity in chunk] for chunk in chunks]
+        if not chunks:
+            return []
+
+        from concurrent.futures import ThreadPoolExecutor
+        from concurrent.futures import wait
+
+        pool = executor or ThreadPoolExecutor(
+            max_workers=min(workers, len(chunks))
+        )
+        try:
+            with self._domain.deferred():
+                # Every chunk finishes before the stage is applied, even when
+                # one of them fails.
+                futures = [pool.submit(fn, chunk) for chunk in chunks]
+                wait(futures)
+                return [future.result() for future in futures]
+        finally:
+            if executor is None:
+                pool.shutdown()
+
+    def on_enter(self, hook: QueryHook) -> QueryHook:
+        """
+        Register a callback invoked with each entity that starts matching this
+        query. Entities already in `result` are not replayed.
+
+        Returns the hook unchanged so this can be used as a decorator.
+        """
+        self._enter_hooks.append(hook)
+        return hook
+
+    def on_exit(self, hook: QueryHook) -> QueryHook:
+        """
+        Register a callback invoked with each entity that stops matching this
+        query, including entities that are destroyed.
+
+        Returns the hook unchanged so this can be used as a decorator.
+        """
+        self._exit_hooks.append(hook)
+        return hook
+
+    def on_change(self, hook: QueryHook) -> QueryHook:
+        """
+        Register a callback invoked with each matching entity that has a
+        component marked changed.
+
+        Returns the hook unchanged so this can be used as a decorator.
+        """
+        self._change_hooks.append(hook)
+        return hook
+
+    def remove_hook(self, hook: QueryHook) -> None:
+        for hooks in (self._enter_hooks, self._exit_hooks, self._change_hooks):
+            if hook in hooks:
+                hooks.remove(hook)
+
+    def clear_changes(self) -> None:
+        # Attribute pending membership changes to the tick they happened in.
+        if self._lazy and self._track_changes:
+            self.reconcile()
+        self._added.clear()
+        self._removed.clear()
+        self._changed.clear()
+
     def index(self, entity: Entity) -> int:
+        if self._lazy:
+            self.reconcile()
+        if self._sort_key is not None:
+            return self._position(entity)
         return self._indices.get(entity, -1)
 
     def matches(self, entity: Entity) -> bool:
-        bits = entity.cbits
+        return self.matches_archetype(entity.archetype)
+
+    def matches_archetype(self, archetype: Archetype) -> bool:
+        verdict = self._verdicts.get(archetype.id)
+        if verdict is None:
+            verdict = self._verdicts[archetype.id] = self.matches_mask(
+                archetype.mask
+            )
+        return verdict
+
+    def matches_mask(self, bits: int) -> bool:
         all_of = bit_intersection(bits, self._all) == self._all
         any_of = self._any == 0 or bool(bit_intersection(bits, self._any))
         none_of = bit_intersection(bits, self._none) == 0
         return any_of & all_of & none_of
 
-    def candidate(self, entity: Entity) -> bool:
-        index = self.index(entity)
+    def candidate(self, entity: Entity, *, destroyed: bool = False) -> bool:
+        """
+        Re-evaluate an entity's membership after its components changed.
+
+        Lazy queries only mark the entity dirty and return False; it is
+        evaluated on the next read of the query. An entity being `destroyed`
+        is evaluated at once even then, so exit hooks run while its
+        components are still attached.
+        """
+        if self._lazy:
+            if not destroyed:
+                self._dirty[entity] = None
+                return False
+            self._dirty.pop(entity, None)
+            if self._stale:
+                return False
+            with self._lock:
+                return self._evaluate(entity)
+        return self._evaluate(entity)
+
+    def reconcile(self) -> None:
+        """Evaluate all candidates recorded since the query was last read."""
+        if not self._stale and not self._dirty:
+            return
+
+        profiler = self._domain.profiler
+        start = profiler.clock() if profiler is not None else 0.0
+
+        # Systems sharing a stage may read the same lazy query concurrently.
+        with self._lock:
+            if self._stale:
+                self._stale = False
+                self._dirty.clear()
+                self.refresh()
+
+            while self._dirty:
+                dirty = self._dirty
+                self._dirty = {}
+                for entity in dirty:
+                    self._evaluate(entity)
+
+            # Changes were recorded for every pending candidate; keep only
+            # those of entities that turned out to be members.
+            if self._changed:
+                self._changed = {
+                    entity: None
+                    for entity in self._changed
+                    if entity in self._indices
+                }
+
+        if profiler is not None:
+            profiler.record_query(self, profiler.clock() - start)
+
+    def _evaluate(self, entity: Entity) -> bool:
+        if self._sort_key is not None:
+            return self._evaluate_sorted(entity)
+        index = self._indices.get(entity, -1)
         is_tracking = index >= 0
 
         if self.matches(entity):
             if not is_tracking:
                 self._cache.append(entity)
                 self._indices[entity] = len(self._cache) - 1
+                if self._track_changes:
+                    self._record_enter(entity)
+                for hook in self._enter_hooks:
+                    hook(entity)
             return True
 
         if is_tracking:
             del self._cache[index]
             self.build_indices()
+            if self._track_changes:
+                self._record_exit(entity)
+            for hook in self._exit_hooks:
+                hook(entity)
         return False
 
+    def _evaluate_sorted(self, entity: Entity) -> bool:
+        is_tracking = entity in self._indices
+
+        if self.matches(entity):
+            if is_tracking:
+                self.resort(entity)
+                return True
+            self._insert_sorted(entity)
+            if self._track_changes:
+                self._record_enter(entity)
+            for hook in self._enter_hooks:
+                hook(entity)
+            return True
+
+        if is_tracking:
+            self._remove_sorted(entity)
+            if self._track_changes:
+                self._record_exit(entity)
+            for hook in self._exit_hooks:
+                hook(entity)
+        return False
+
+    def _insert_sorted(self, entity: Entity) -> None:
+        entry = (self._sort_key(entity), next(self._arrivals))
+        index = bisect_right(self._keys, entry)
+        self._keys.insert(index, entry)
+        self._cache.insert(index, entity)
+        self._indices[entity] = entry
+
+    def _remove_sorted(self, entity: Entity) -> None:
+        index = self._position(entity)
+        del self._keys[index]
+        del self._cache[index]
+        del self._indices[entity]
+
+    def _position(self, entity: Entity) -> int:
+        entry = self._indices.get(entity)
+        if entry is None:
+            return -1
+        return bisect_left(self._keys, entry)
+
+    def resort(self, entity: Entity) -> None:
+        """
+        Move a member of a sorted query to its new position after its sort
+        key changed. Called automatically when one of the entity's
+        components is marked changed.
+        """
+        entry = self._indices.get(entity)
+        if entry is None or self._sort_key(entity) == entry[0]:
+            return
+        self._remove_sorted(entity)
+        self._insert_sorted(entity)
+
+    def mark_changed(self, entity: Entity) -> None:
+        if self._sort_key is not None:
+            if self._lazy:
+                self._dirty[entity] = None
+            else:
+                self.resort(entity)
+        if self._change_hooks and entity in self._indices:
+            for hook in self._change_hooks:
+                hook(entity)
+        if not self._track_changes:
+            return
+        if entity in self._indices or entity in self._dirty:
+            self._changed[entity] = None
+
     def refresh(self) -> None:
         self._cache = []
-        for entity in self._domain.entities.values():
-            self.candidate(entity)
+        self._indices = {}
+        if self._sort_key is not None:
+            self._refresh_sorted()
+            return
+        for entity in self._members():
+            self._evaluate(entity)
+
+    def _members(self) -> list[Entity]:
+        # Walk the Domain archetype by archetype so groups of entities that
+        # cannot match are skipped without visiting any of them, then put
+        # the members back in creation order. Each group is mostly in that
+        # order already, which keeps the sort close to linear.
+        groups = [
+            archetype.entities
+            for archetype in list(self._domain.archetypes)
+            if archetype.entities and self.matches_archetype(archetype)
+        ]
+        members = [entity for group in groups for entity in group]
+        if len(groups) > 1:
+            members.sort(key=attrgetter("seq"))
+        return members
+
+    def _refresh_sorted(self) -> None:
+        # Sort all members once rather than inserting them one by one.
+        sort_key = self._sort_key
+        members = [(sort_key(entity), entity) for entity in self._members()]
+        members.sort(key=lambda member: member[0])
+        self._keys = [(key, next(self._arrivals)) for key, _ in members]
+        self._cache = [entity for _, entity in members]
+        self._indices = dict(zip(self._cache, self._keys))
+        for entity in self._cache:
+            if self._track_changes:
+                self._record_enter(entity)
+            for hook in self._enter_hooks:
+                hook(entity)
+
+    def _record_enter(self, entity: Entity) -> None:
+        # Leaving and re-entering within one tick is not a net change.
+        if entity in self._removed:
+            del self._removed[entity]
+        else:
+            self._added[entity] = None
+
+    def _record_exit(self, entity: Entity) -> None:
+        self._changed.pop(entity, None)
+        if entity in self._added:
+            del self._added[entity]
+        else:
+            self._removed[entity] = None
 
     def build_indices(self) -> None:
         self._indices = dict(zip(self._cache, range(0, len(self._cache))))
+
+
+class QueryHandle:
+    """
+    One holder's reference to a shared Query, as returned by
+    `Domain.create_query`.
+
+    Reads are forwarded to the shared Query. Hooks registered through a
+    handle belong to that holder and are removed when the handle is
+    disposed, while the Query itself keeps running for its other holders.
+    Handles to the same Query compare equal.
+    """
+
+    def __init__(self, query: Query) -> None:
+        self._query = query
+        # (hook list of the Query, hook) for each registration made here.
+        self._hooks: list[tuple[list[QueryHook], QueryHook]] = []
+        self._released = False
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._query, name)
+
+    def __repr__(self) -> str:
+        return repr(self._query)
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, QueryHandle):
+            other = other._query
+        return self._query is other
+
+    def __hash__(self) -> int:
+        return hash(self._query)
+
+    @property
+    def query(self) -> Query:
+        """The shared Query behind this handle."""
+        return self._query
+
+    @property
+    def result(self) -> Sequence[Entity]:
+        return self._query.result
+
+    @property
+    def disposed(self) -> bool:
+        return self._released or self._query.disposed
+
+    def dispose(self) -> None:
+        """
+        Remove the hooks registered through this handle and release its
+        reference to the shared Query.
+        """
+        if self.disposed:
+            return
+        self._released = True
+        for hooks, hook in self._hooks:
+            if hook in hooks:
+                hooks.remove(hook)
+        self._hooks.clear()
+        self._query.dispose()
+
+    def on_enter(self, hook: QueryHook) -> QueryHook:
+        self._hooks.append((self._query._enter_hooks, hook))
+        return self._query.on_enter(hook)
+
+    def on_exit(self, hook: QueryHook) -> QueryHook:
+        self._hooks.append((self._query._exit_hooks, hook))
+        return self._query.on_exit(hook)
+
+    def on_change(self, hook: QueryHook) -> QueryHook:
+        self._hooks.append((self._query._change_hooks, hook))
+        return self._query.on_change(hook)
+
+    def remove_hook(self, hook: QueryHook) -> None:
+        self._hooks = [entry for entry in self._hooks if entry[1] is not hook]
+        self._query.remove_hook(hook)
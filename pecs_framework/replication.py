@@ -0,0 +1,480 @@
+from __future__ import annotations
+from beartype.typing import TYPE_CHECKING
+from beartype.typing import Any
+from beartype.typing import Hashable
+
+if TYPE_CHECKING:
+    from pecs_framework._types import CompId
+    from pecs_framework.domain import Domain
+    from pecs_framework.entity import Entity
+    from pecs_framework.query import QueryHandle
+
+import itertools
+import struct
+
+from pecs_framework.snapshot import BY_REFERENCE
+from pecs_framework.snapshot import copy_state
+
+
+# Replicated state: entity id -> component id -> public field values, or
+# None for a tag component.
+FieldState = dict[str, Any]
+EntityState = dict["CompId", FieldState | None]
+WorldState = dict[str, EntityState]
+
+_NONE, _FALSE, _TRUE, _INT, _FLOAT, _STR, _LIST, _DICT = range(8)
+_SPAWN, _NEW_COMPONENT, _TAG = 1, 1, 2
+_DOUBLE = struct.Struct("<d")
+_ABSENT = object()
+
+
+def public_state(entity: Entity) -> EntityState:
+    """
+    Copy the public (non-underscore) fields of each of an entity's
+    components, with None for each tag component it has.
+
+    Raises
+    ------
+    TypeError
+        If a public field holds an Entity, Component or class, which cannot
+        be sent to another process
+    """
+    state: EntityState = {}
+    for comp_id, component in entity.components.items():
+        fields = {
+            key: value
+            for key, value in vars(component).items()
+            if not key.startswith("_")
+        }
+        for key, value in fields.items():
+            if isinstance(value, BY_REFERENCE):
+                raise TypeError(
+                    f"Cannot replicate {comp_id}.{key}: it holds a "
+                    f"{type(value).__name__} reference; store an entity id "
+                    "or keep the field private"
+                )
+        state[comp_id] = copy_state(fields)
+    registry = entity.domain.engine.components
+    if registry.tags:
+        for tag in registry.tags_of(entity):
+            state[tag.comp_id] = None
+    return state
+
+
+class _ClientState:
+
+    def __init__(self) -> None:
+        self.sequence: int = 0
+        self.baseline: WorldState = {}
+        self.known: set[str] = set()
+        self.pending: dict[int, tuple[WorldState, set[str]]] = {}
+        # Entities the client may still hold after a resync dropped the
+        # states they were recorded in.
+        self.resync: set[str] = set()
+
+    def holds(self, eid: str) -> bool:
+        """Whether the client may have `eid` without having acked its loss."""
+        return (
+            eid in self.baseline
+            or eid in self.resync
+            or any(eid in sent for sent, _ in self.pending.values())
+        )
+
+
+class Replicator:
+    """
+    Server side of state replication for the entities of a Query.
+
+    Call `capture` once per network tick, then `encode` for each client to get
+    a binary packet holding only the entities, components and fields that
+    differ from what that client last acknowledged with `ack`. Packets are
+    deltas against the acknowledged state, so any of them may be lost; the
+    next one repeats whatever has not been acknowledged yet.
+
+    A client with more than `max_pending` unacknowledged packets is resent
+    every entity in full instead, so the packets kept for it stay bounded.
+
+    ```py
+    replicator = Replicator(domain.create_query(all_of=[Networked]))
+    replicator.add_client("alice")
+
+    replicator.capture()
+    send("alice", replicator.encode("alice"))
+    # ... when alice acknowledges sequence n:
+    replicator.ack("alice", n)
+    ```
+    """
+
+    max_pending: int = 64
+
+    def __init__(self, query: QueryHandle) -> None:
+        self._query = query
+        self._clients: dict[Hashable, _ClientState] = {}
+        self._net_ids: dict[str, int] = {}
+        self._next_id = itertools.count()
+        self._current: WorldState = {}
+        # Entities that left the query and may still be held by a client.
+        self._destroyed: set[str] = set()
+
+    @property
+    def clients(self) -> list[Hashable]:
+        return list(self._clients)
+
+    def add_client(self, client: Hashable) -> None:
+        self._clients[client] = _ClientState()
+
+    def remove_client(self, client: Hashable) -> None:
+        del self._clients[client]
+        self._prune()
+
+    def capture(self) -> WorldState:
+        """Record the current state of the replicated entities."""
+        previous = self._current
+        self._current = {
+            entity.eid: public_state(entity) for entity in self._query.result
+        }
+        self._destroyed.update(
+            eid for eid in previous if eid not in self._current
+        )
+        self._prune()
+        return self._current
+
+    def ack(self, client: Hashable, sequence: int) -> None:
+        """Mark the packet `sequence` as received by `client`."""
+        state = self._clients[client]
+        if sequence not in state.pending:
+            return
+        state.baseline, state.known = state.pending[sequence]
+        state.resync.clear()
+        for sent in [seq for seq in state.pending if seq <= sequence]:
+            del state.pending[sent]
+        self._prune()
+
+    def _prune(self) -> None:
+        # Net ids are never reused, so one can be dropped as soon as no
+        # client can still refer to its entity.
+        for eid in list(self._destroyed):
+            if eid in self._current:
+                self._destroyed.discard(eid)
+            elif not any(state.holds(eid) for state in self._clients.values()):
+                self._destroyed.discard(eid)
+                self._net_ids.pop(eid, None)
+
+    def encode(self, client: Hashable) -> bytes:
+        """
+        Build the delta packet for `client` from the last `capture`.
+
+        Fields are included when they differ from the acknowledged baseline
+        or from any packet sent since, so that a client which applied a
+        later, unacknowledged packet is still brought up to date.
+        """
+        state = self._clients[client]
+        if len(state.pending) >= self.max_pending:
+            self._resync(state)
+        state.sequence += 1
+        current = self._current
+        unacked = [sent for sent, _ in state.pending.values()]
+        views = [state.baseline, *unacked]
+
+        writer = _Writer()
+        seen = set(state.baseline) | state.resync
+        for sent in unacked:
+            seen.update(sent)
+        destroyed = [eid for eid in seen if eid not in current]
+
+        entities = []
+        for eid, components in current.items():
+            record = self._entity_delta(eid, components, views, state.known)
+            if record is not None:
+                entities.append(record)
+
+        writer.varint(state.sequence)
+        writer.varint(len(destroyed))
+        for eid in destroyed:
+            writer.varint(self._net_ids[eid])
+        writer.varint(len(entities))
+        for record in entities:
+            self._write_entity(writer, record)
+
+        state.pending[state.sequence] = (current, set(current))
+        return writer.getvalue()
+
+    def _resync(self, state: _ClientState) -> None:
+        # Forget what the client may have applied and spawn every entity
+        # again; spawn records replace the client's component set outright.
+        state.resync.update(state.baseline)
+        for sent, _ in state.pending.values():
+            state.resync.update(sent)
+        state.baseline = {}
+        state.known = set()
+        state.pending.clear()
+
+    def _entity_delta(
+        self,
+        eid: str,
+        components: EntityState,
+        views: list[WorldState],
+        known: set[str],
+    ) -> tuple[Any, ...] | None:
+        if eid not in self._net_ids:
+            self._net_ids[eid] = next(self._next_id)
+        spawn = eid not in known
+
+        previous = [view.get(eid, {}) for view in views]
+        removed = sorted({
+            comp_id
+            for before in previous
+            for comp_id in before
+            if comp_id not in components
+        })
+
+        changed = []
+        for comp_id, fields in components.items():
+            befores = [before.get(comp_id, _ABSENT) for before in previous]
+            if spawn or any(before is _ABSENT for before in befores):
+                changed.append((comp_id, True, fields))
+                continue
+            if fields is None:
+                continue
+            delta = {
+                key: value
+                for key, value in fields.items()
+                if any(
+                    key not in before or before[key] != value
+                    for before in befores
+                )
+            }
+            if delta:
+                changed.append((comp_id, False, delta))
+
+        if not spawn and not removed and not changed:
+            return None
+        return eid, spawn, removed, changed
+
+    def _write_entity(self, writer: _Writer, record: tuple[Any, ...]) -> None:
+        eid, spawn, removed, changed = record
+        writer.varint(self._net_ids[eid])
+        writer.byte(_SPAWN if spawn else 0)
+        if spawn:
+            writer.string(eid)
+            alias = self._query._domain.entities.eid_to_alias.get(eid)
+            writer.value(alias)
+        writer.varint(len(removed))
+        for comp_id in removed:
+            writer.string(comp_id)
+        writer.varint(len(changed))
+        for comp_id, new, fields in changed:
+            writer.string(comp_id)
+            if fields is None:
+                writer.byte(_NEW_COMPONENT | _TAG)
+                continue
+            writer.byte(_NEW_COMPONENT if new else 0)
+            writer.varint(len(fields))
+            for key, value in fields.items():
+                writer.string(key)
+                writer.value(value)
+
+
+class DeltaDecoder:
+    """
+    Client side of state replication: applies packets produced by a
+    Replicator to a receiving Domain.
+
+    New components are created without calling their constructor, from the
+    replicated field values; changed fields are set in place and the
+    component is marked changed so change hooks see the update. A spawn
+    record carries the entity's whole component set, so components it does
+    not list are removed.
+    """
+
+    def __init__(self, domain: Domain) -> None:
+        self._domain = domain
+        self._eids: dict[int, str] = {}
+        self.sequence: int = 0
+
+    def apply(self, packet: bytes) -> int:
+        """
+        Apply one packet and return its sequence number, which the client
+        should acknowledge. Packets older than the newest applied one are
+        ignored.
+        """
+        reader = _Reader(packet)
+        sequence = reader.varint()
+        if sequence <= self.sequence:
+            return sequence
+        self.sequence = sequence
+
+        entities = self._domain.entities
+        registry = self._domain.engine.components
+        for _ in range(reader.varint()):
+            eid = self._eids.pop(reader.varint(), None)
+            if eid is not None and eid in entities.keys():
+                alias = entities.eid_to_alias.get(eid)
+                if alias is not None:
+                    entities.remove_entity_by_alias(alias)
+                else:
+                    entities.remove_entity_by_id(eid)
+
+        for _ in range(reader.varint()):
+            net_id = reader.varint()
+            spawn = reader.byte() == _SPAWN
+            if spawn:
+                eid = reader.string()
+                alias = reader.value()
+                self._eids[net_id] = eid
+                if eid not in entities.keys():
+                    entities.create(alias, entity_id=eid)
+            entity = entities.get_by_id(self._eids[net_id])
+
+            for _ in range(reader.varint()):
+                component_type = registry.get_type(reader.string())
+                if registry.has(entity, component_type):
+                    registry.remove(entity, component_type)
+
+            listed = set()
+            for _ in range(reader.varint()):
+                component_type = registry.get_type(reader.string())
+                listed.add(component_type.comp_id)
+                if reader.byte() & _TAG:
+                    if not registry.has(entity, component_type):
+                        registry.attach(entity, component_type)
+                    continue
+                fields = {
+                    reader.string(): reader.value()
+                    for _ in range(reader.varint())
+                }
+                if not registry.has(entity, component_type):
+                    instance = component_type.__new__(component_type)
+                    vars(instance).update(fields)
+                    registry.attach(entity, instance)
+                else:
+                    instance = entity[component_type]
+                    for key, value in fields.items():
+                        setattr(instance, key, value)
+                    registry.mark_changed(entity, component_type)
+
+            if spawn:
+                present = [*entity.components, *(
+                    tag.comp_id for tag in registry.tags_of(entity)
+                )]
+                for comp_id in present:
+                    if comp_id not in listed:
+                        registry.remove(entity, registry.get_type(comp_id))
+        return sequence
+
+
+class _Writer:
+    """
+    Packs a packet: varints, zigzag-encoded ints, float64s, and strings
+    written once and referenced by index afterwards.
+    """
+
+    def __init__(self) -> None:
+        self._body = bytearray()
+        self._strings: dict[str, int] = {}
+
+    def getvalue(self) -> bytes:
+        # The string table is emitted up front so the reader can resolve
+        # references as it goes.
+        head = _Writer()
+        head.varint(len(self._strings))
+        for string in self._strings:
+            encoded = string.encode()
+            head.varint(len(encoded))
+            head._body += encoded
+        return bytes(head._body + self._body)
+
+    def byte(self, value: int) -> None:
+        self._body.append(value)
+
+    def varint(self, value: int) -> None:
+        body = self._body
+        while value >= 0x80:
+            body.append((value & 0x7F) | 0x80)
+            value >>= 7
+        body.append(value)
+
+    def string(self, value: str) -> None:
+        index = self._strings.get(value)
+        if index is None:
+            index = self._strings[value] = len(self._strings)
+        self.varint(index)
+
+    def value(self, value: Any) -> None:
+        if value is None:
+            self.byte(_NONE)
+        elif value is True or value is False:
+            self.byte(_TRUE if value else _FALSE)
+        elif isinstance(value, int):
+            self.byte(_INT)
+            self.varint(value * 2 if value >= 0 else -value * 2 - 1)
+        elif isinstance(value, float):
+            self.byte(_FLOAT)
+            self._body += _DOUBLE.pack(value)
+        elif isinstance(value, str):
+            self.byte(_STR)
+            self.string(value)
+        elif isinstance(value, (list, tuple)):
+            self.byte(_LIST)
+            self.varint(len(value))
+            for item in value:
+                self.value(item)
+        elif isinstance(value, dict):
+            self.byte(_DICT)
+            self.varint(len(value))
+            for key, item in value.items():
+                self.value(key)
+                self.value(item)
+        else:
+            raise TypeError(f"Cannot replicate value of type {type(value)!r}")
+
+
+class _Reader:
+
+    def __init__(self, data: bytes) -> None:
+        self._data = data
+        self._pos = 0
+        self._strings = []
+        for _ in range(self.varint()):
+            length = self.varint()
+            start = self._pos
+            self._pos += length
+            self._strings.append(data[start:self._pos].decode())
+
+    def byte(self) -> int:
+        value = self._data[self._pos]
+        self._pos += 1
+        return value
+
+    def varint(self) -> int:
+        result = shift = 0
+        while True:
+            byte = self.byte()
+            result |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                return result
+            shift += 7
+
+    def string(self) -> str:
+        return self._strings[self.varint()]
+
+    def value(self) -> Any:
+        tag = self.byte()
+        if tag == _NONE:
+            return None
+        if tag == _FALSE or tag == _TRUE:
+            return tag == _TRUE
+        if tag == _INT:
+            raw = self.varint()
+            return raw >> 1 if not raw & 1 else -((raw + 1) >> 1)
+        if tag == _FLOAT:
+            (value,) = _DOUBLE.unpack_from(self._data, self._pos)
+            self._pos += _DOUBLE.size
+            return value
+        if tag == _STR:
+            return self.string()
+        if tag == _LIST:
+            return [self.value() for _ in range(self.varint())]
+        if tag == _DICT:
+            return {self.value(): self.value() for _ in range(self.varint())}
+        raise ValueError(f"Unknown value tag {tag}")
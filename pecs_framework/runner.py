@@ -0,0 +1,115 @@
+from __future__ import annotations
+from beartype.typing import TYPE_CHECKING
+from beartype.typing import Callable
+
+if TYPE_CHECKING:
+    from pecs_framework.base_system import Loop
+
+import time
+
+
+class FixedTimestepRunner:
+    """
+    Drive a Loop at a fixed simulation timestep.
+
+    Real elapsed time is added to an accumulator and consumed in whole
+    timesteps, so the simulation catches up after slow frames. Each step
+    calls the loop's `pre_update`, `update` and `post_update` hooks and then
+    advances the Domain tick.
+
+    When a `budget` (in seconds) is given, the loop's scheduler is handed a
+    deadline for the frame so it can put off low priority systems once the
+    frame runs long.
+
+    ```py
+    runner = FixedTimestepRunner(game_loop, timestep=1 / 30, budget=0.025)
+    runner.run()
+    ```
+    """
+
+    def __init__(
+        self,
+        loop: Loop,
+        timestep: float = 1 / 60,
+        *,
+        max_steps: int = 5,
+        budget: float | None = None,
+        clock: Callable[[], float] = time.perf_counter,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        if timestep <= 0:
+            raise ValueError("timestep must be positive")
+        self.loop = loop
+        self.timestep = timestep
+        self.max_steps = max_steps
+        self.budget = budget
+        self.clock = clock
+        self.sleep = sleep
+
+        self.steps: int = 0
+        self.dropped: float = 0.0
+        self._accumulator: float = 0.0
+        self._running: bool = False
+
+    @property
+    def alpha(self) -> float:
+        """Fraction of a timestep left in the accumulator, for interpolation."""
+        return self._accumulator / self.timestep
+
+    def advance(self, elapsed: float) -> int:
+        """
+        Add `elapsed` seconds of real time and run as many fixed steps as it
+        covers, up to `max_steps`. Time that still can't be covered after
+        that is dropped rather than carried into the next frame.
+
+        Returns
+        -------
+            The number of steps run
+        """
+        self._accumulator += elapsed
+        deadline = None
+        if self.budget is not None:
+            deadline = self.clock() + self.budget
+
+        steps = 0
+        while self._accumulator >= self.timestep and steps < self.max_steps:
+            self.step(deadline)
+            self._accumulator -= self.timestep
+            steps += 1
+
+        if self._accumulator >= self.timestep:
+            excess = self._accumulator - self._accumulator % self.timestep
+            self.dropped += excess
+            self._accumulator -= excess
+        return steps
+
+    def step(self, deadline: float | None = None) -> None:
+        """Run a single simulation tick."""
+        loop = self.loop
+        loop.scheduler.deadline = deadline
+        loop.pre_update()
+        loop.update()
+        loop.post_update()
+        loop.domain.advance_tick()
+        self.steps += 1
+
+    def run(self, duration: float | None = None) -> None:
+        """
+        Run in real time until `stop` is called or `duration` seconds have
+        passed, sleeping between steps.
+        """
+        self._running = True
+        start = last = self.clock()
+        while self._running:
+            now = self.clock()
+            if duration is not None and now - start >= duration:
+                break
+            self.advance(now - last)
+            last = now
+            remaining = self.timestep - self._accumulator
+            if remaining > 0:
+                self.sleep(remaining)
+        self._running = False
+
+    def stop(self) -> None:
+        self._running = False
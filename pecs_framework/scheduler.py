@@ -0,0 +1,190 @@
+from __future__ import annotations
+from beartype.typing import TYPE_CHECKING
+from beartype.typing import Sequence
+from beartype.typing import Callable
+
+if TYPE_CHECKING:
+    from concurrent.futures import Executor
+    from pecs_framework.base_system import BaseSystem
+
+from concurrent.futures import wait
+import heapq
+import time
+
+
+def conflicts(a: BaseSystem, b: BaseSystem) -> bool:
+    """
+    Two systems conflict when either one writes a component type the other
+    reads or writes. Systems that declare no access at all are assumed to
+    touch everything.
+    """
+    if not a.declares_access or not b.declares_access:
+        return True
+    a_reads, a_writes = a.access()
+    b_reads, b_writes = b.access()
+    return bool(
+        a_writes & (b_reads | b_writes)
+        or b_writes & a_reads
+    )
+
+
+def update(system: BaseSystem) -> None:
+    profiler = system.loop.domain.profiler
+    if profiler is None:
+        system.update()
+        return
+    start = profiler.clock()
+    system.update()
+    profiler.record_system(type(system).__name__, profiler.clock() - start)
+
+
+class Scheduler:
+    """
+    Orders a set of systems from their declared component access.
+
+    Systems are kept in registration order unless an explicit `after`
+    dependency says otherwise. Conflicting systems always run in that order,
+    while non-conflicting systems are grouped into the same stage so they may
+    be run independently of each other.
+
+    Each run only updates the systems due on the Domain's current tick (see
+    `BaseSystem.interval`). If `deadline` is set and has passed, low priority
+    systems are skipped and run on a later tick instead, up to `max_skips`
+    consecutive times.
+    """
+
+    def __init__(
+        self,
+        systems: Sequence[BaseSystem],
+        *,
+        max_skips: int = 10,
+        clock: Callable[[], float] = time.perf_counter,
+    ) -> None:
+        self._systems = list(systems)
+        self._order: list[BaseSystem] = []
+        self._stages: list[list[BaseSystem]] = []
+        self._skipped: dict[BaseSystem, int] = {}
+        self.max_skips = max_skips
+        self.deadline: float | None = None
+        self.clock = clock
+        self.build()
+
+    @property
+    def systems(self) -> list[BaseSystem]:
+        return self._systems
+
+    @property
+    def order(self) -> list[BaseSystem]:
+        """All systems in a deterministic, dependency-respecting order."""
+        return self._order
+
+    @property
+    def stages(self) -> list[list[BaseSystem]]:
+        """Groups of mutually non-conflicting systems, in execution order."""
+        return self._stages
+
+    @property
+    def skipped(self) -> dict[BaseSystem, int]:
+        """Low priority systems waiting to run, with their skip counts."""
+        return self._skipped
+
+    def build(self) -> None:
+        systems = self._systems
+        count = len(systems)
+        edges: list[set[int]] = [set() for _ in range(count)]
+
+        for j, system in enumerate(systems):
+            for dependency in system.after:
+                for i, other in enumerate(systems):
+                    if i != j and isinstance(other, dependency):
+                        edges[i].add(j)
+
+        # Implicit edges follow registration order, except where an explicit
+        # dependency already orders the pair the other way around.
+        for i in range(count):
+            for j in range(i + 1, count):
+                if i in edges[j]:
+                    continue
+                if conflicts(systems[i], systems[j]):
+                    edges[i].add(j)
+
+        indegree = [0] * count
+        for targets in edges:
+            for j in targets:
+                indegree[j] += 1
+
+        ready = [i for i in range(count) if indegree[i] == 0]
+        heapq.heapify(ready)
+        levels = [0] * count
+        order: list[int] = []
+
+        while ready:
+            i = heapq.heappop(ready)
+            order.append(i)
+            for j in edges[i]:
+                levels[j] = max(levels[j], levels[i] + 1)
+                indegree[j] -= 1
+                if indegree[j] == 0:
+                    heapq.heappush(ready, j)
+
+        if len(order) < count:
+            cyclic = [
+                type(systems[i]).__name__
+                for i in range(count) if i not in order
+            ]
+            raise ValueError(f"Cyclic system dependencies between {cyclic}")
+
+        stages: list[list[BaseSystem]] = [[] for _ in range(max(levels, default=-1) + 1)]
+        for i in order:
+            stages[levels[i]].append(systems[i])
+
+        self._order = [systems[i] for i in order]
+        self._stages = stages
+
+    def run(self, executor: Executor | None = None) -> None:
+        """
+        Update every system, stage by stage.
+
+        With an executor, the systems of each stage are submitted to it
+        concurrently and structural changes they make are deferred until the
+        whole stage has finished. If a system raises, the rest of its stage
+        still runs to completion, the stage's changes are discarded, and the
+        first exception is raised.
+        """
+        if executor is None:
+            for system in self._order:
+                if self._due(system):
+                    update(system)
+            return
+
+        for stage in self._stages:
+            due = [system for system in stage if self._due(system)]
+            if not due:
+                continue
+
+            with due[0].loop.domain.deferred():
+                if len(due) == 1:
+                    update(due[0])
+                    continue
+                futures = [executor.submit(update, system) for system in due]
+                # Leave the deferred block only once no system can still be
+                # making changes from a worker thread.
+                wait(futures)
+                for future in futures:
+                    future.result()
+
+    def _due(self, system: BaseSystem) -> bool:
+        skipped = system in self._skipped
+        if not skipped and system.loop.domain.tick % system.interval != 0:
+            return False
+
+        over_budget = self.deadline is not None and self.clock() > self.deadline
+        if system.low_priority and over_budget:
+            skips = self._skipped.get(system, 0)
+            if skips < self.max_skips:
+                self._skipped[system] = skips + 1
+                return False
+
+        if skipped:
+            del self._skipped[system]
+        return True
@@ -0,0 +1,352 @@
+from __future__ import annotations
+from beartype.typing import TYPE_CHECKING
+from beartype.typing import Any
+from beartype.typing import Callable
+from beartype.typing import TypedDict
+
+if TYPE_CHECKING:
+    from multiprocessing.connection import Connection
+    from pecs_framework.domain import ComponentDict
+    from pecs_framework.domain import Domain
+    from pecs_framework.engine import Engine
+    from pecs_framework.entity import Entity
+
+import contextlib
+import multiprocessing
+import traceback
+
+from pecs_framework.domain import serialize_entity
+
+
+class TransferMessage(TypedDict):
+    kind: str
+    destination: str
+    eid: str
+    alias: str | None
+    components: list[ComponentDict]
+
+
+class EventMessage(TypedDict):
+    kind: str
+    destination: str
+    target: str
+    name: str
+    data: dict[str, Any]
+
+
+ShardMessage = TransferMessage | EventMessage
+ShardSetup = Callable[["Shard"], "Engine"]
+ShardStep = Callable[["Shard"], Any]
+
+
+class ShardError(RuntimeError):
+    """
+    Raised in the parent process when one or more shard workers fail.
+    `failures` maps each failed shard's name to its worker traceback.
+    """
+
+    def __init__(
+        self,
+        message: str,
+        failures: dict[str, str] | None = None,
+    ) -> None:
+        super().__init__(message)
+        self.failures = failures if failures else {}
+
+
+class Shard:
+    """
+    Worker-side handle for one shard of a ShardPool.
+
+    Each shard owns an Engine (and so its own Domain and ComponentRegistry)
+    built by the pool's setup function inside the worker process. Entities
+    and events bound for other shards are queued on the shard and delivered
+    to their destination before its next step.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.tick: int = 0
+        self._engine: Engine | None = None
+        self._outbox: list[ShardMessage] = []
+
+    @property
+    def engine(self) -> Engine:
+        if self._engine is None:
+            raise RuntimeError(f"Shard {self.name!r} has no engine yet")
+        return self._engine
+
+    @property
+    def domain(self) -> Domain:
+        return self.engine.domain
+
+    def transfer(self, entity: Entity, destination: str) -> None:
+        """
+        Move an entity to another shard. It is destroyed here immediately and
+        recreated with the same id, alias and component state on the
+        destination shard at the start of its next step.
+        """
+        alias = self.domain.entities.get_alias_for_entity(entity)
+        message: TransferMessage = {
+            "kind": "transfer",
+            "destination": destination,
+            "eid": entity.eid,
+            "alias": alias,
+            "components": serialize_entity(entity),
+        }
+        self._outbox.append(message)
+        self.domain.destroy_entity(entity)
+
+    def send_event(
+        self,
+        destination: str,
+        target: str,
+        name: str,
+        data: dict[str, Any] | None = None,
+    ) -> None:
+        """
+        Fire an event on an entity of another shard, addressed by entity id
+        or alias. The event is fired at the start of the destination's next
+        step.
+        """
+        message: EventMessage = {
+            "kind": "event",
+            "destination": destination,
+            "target": target,
+            "name": name,
+            "data": data if data else {},
+        }
+        self._outbox.append(message)
+
+    def receive(self, messages: list[ShardMessage]) -> None:
+        # Transfers land before events so events can address arrivals.
+        for message in messages:
+            if message["kind"] == "transfer":
+                self._receive_transfer(message)
+        for message in messages:
+            if message["kind"] == "event":
+                self._receive_event(message)
+
+    def drain(self) -> list[ShardMessage]:
+        outbox, self._outbox = self._outbox, []
+        return outbox
+
+    def _receive_transfer(self, message: TransferMessage) -> None:
+        entity = self.domain.entities.create(
+            alias=message["alias"],
+            entity_id=message["eid"],
+        )
+        for component_data in message["components"]:
+            self.engine.components.attach(
+                entity,
+                component_data["comp_id"],
+                dict(component_data["data"]),
+            )
+
+    def _receive_event(self, message: EventMessage) -> None:
+        entities = self.domain.entities
+        target = message["target"]
+        if target in entities.keys():
+            entity = entities.get_by_id(target)
+        elif target in entities.alias_to_eid:
+            entity = entities.get_by_alias(target)
+        else:
+            return
+        entity.fire_event(message["name"], message["data"])
+
+
+def _step_shard(
+    shard: Shard,
+    step: ShardStep,
+    messages: list[ShardMessage],
+) -> tuple[list[ShardMessage], str | None]:
+    # A failed step still counts as a tick and still hands over what it
+    # queued before failing, so the shard stays in lockstep with the pool and
+    # entities it already transferred out are not lost.
+    try:
+        shard.receive(messages)
+        step(shard)
+    except Exception:
+        failure = traceback.format_exc()
+    else:
+        failure = None
+    shard.tick += 1
+    return shard.drain(), failure
+
+
+def _run_shard(
+    name: str,
+    conn: Connection,
+    setup: ShardSetup,
+    step: ShardStep,
+) -> None:
+    shard = Shard(name)
+    try:
+        shard._engine = setup(shard)
+    except Exception:
+        conn.send(("error", traceback.format_exc()))
+        conn.close()
+        return
+    conn.send(("ready", None))
+
+    while True:
+        command, payload = conn.recv()
+        try:
+            if command == "step":
+                conn.send(("done", _step_shard(shard, step, payload)))
+            elif command == "call":
+                conn.send(("done", payload(shard)))
+            elif command == "stop":
+                conn.close()
+                return
+        except Exception:
+            conn.send(("error", traceback.format_exc()))
+
+
+class ShardPool:
+    """
+    Run several independent domains in worker processes, stepping them in
+    lockstep.
+
+    `setup` and `step` must be picklable (module-level) functions. `setup`
+    receives the worker's Shard and returns the Engine it should own; `step`
+    is called once per tick with the Shard.
+
+    ```py
+    def setup(shard: Shard) -> Engine:
+        ecs = Engine(loader=loader)
+        ecs.create_domain(shard.name)
+        ecs.components.load("game.components")
+        return ecs
+
+    def step(shard: Shard) -> None:
+        for entity in leaving_region(shard.domain):
+            shard.transfer(entity, neighbour_of(shard.name))
+
+    with ShardPool(["north", "south"], setup, step) as pool:
+        for _ in range(100):
+            pool.step()
+    ```
+    """
+
+    def __init__(
+        self,
+        names: list[str],
+        setup: ShardSetup,
+        step: ShardStep,
+        *,
+        mp_context: str | None = None,
+    ) -> None:
+        context = multiprocessing.get_context(mp_context)
+        self._names = list(names)
+        self._connections: dict[str, Connection] = {}
+        self._processes: dict[str, multiprocessing.process.BaseProcess] = {}
+        self._inboxes: dict[str, list[ShardMessage]] = {n: [] for n in names}
+        self.tick: int = 0
+
+        try:
+            for name in self._names:
+                parent_conn, child_conn = context.Pipe()
+                process = context.Process(
+                    target=_run_shard,
+                    args=(name, child_conn, setup, step),
+                    name=f"pecs-shard-{name}",
+                    daemon=True,
+                )
+                process.start()
+                child_conn.close()
+                self._connections[name] = parent_conn
+                self._processes[name] = process
+
+            self._raise_failures(self._gather(self._names)[1])
+        except BaseException:
+            # The pool never reaches __enter__, so stop the workers here.
+            self.close()
+            raise
+
+    @property
+    def names(self) -> list[str]:
+        return self._names
+
+    def step(self) -> None:
+        """
+        Advance every shard by one tick, delivering the transfers and events
+        produced during the previous tick first.
+
+        If any shard fails, the pool and every shard still advance one tick,
+        and all queued messages, including those a failed step queued before
+        raising, are delivered on the next step; then a single ShardError
+        listing every failure is raised.
+        """
+        for name in self._names:
+            inbox, self._inboxes[name] = self._inboxes[name], []
+            self._connections[name].send(("step", inbox))
+
+        replies, failures = self._gather(self._names)
+        unknown = []
+        for name, (outbox, failure) in replies.items():
+            if failure is not None:
+                failures[name] = failure
+            for message in outbox:
+                destination = message["destination"]
+                if destination not in self._inboxes:
+                    unknown.append(destination)
+                    continue
+                self._inboxes[destination].append(message)
+        self.tick += 1
+        self._raise_failures(failures)
+        if unknown:
+            raise ShardError(f"Unknown shard {unknown[0]!r}")
+
+    def call(self, name: str, fn: Callable[[Shard], Any]) -> Any:
+        """
+        Run a picklable function against one shard in its worker process and
+        return its (picklable) result.
+        """
+        self._connections[name].send(("call", fn))
+        replies, failures = self._gather([name])
+        self._raise_failures(failures)
+        return replies[name]
+
+    def close(self) -> None:
+        for name, conn in self._connections.items():
+            if self._processes[name].is_alive():
+                # A worker whose setup failed may be exiting already.
+                with contextlib.suppress(OSError):
+                    conn.send(("stop", None))
+            conn.close()
+        for process in self._processes.values():
+            process.join()
+        self._connections.clear()
+
+    def __enter__(self) -> ShardPool:
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def _gather(
+        self,
+        names: list[str],
+    ) -> tuple[dict[str, Any], dict[str, str]]:
+        # Every reply is read before anything is raised, so no pipe is left
+        # holding a reply that a later request would mistake for its own.
+        replies: dict[str, Any] = {}
+        failures: dict[str, str] = {}
+        for name in names:
+            status, payload = self._connections[name].recv()
+            if status == "error":
+                failures[name] = payload
+            else:
+                replies[name] = payload
+        return replies, failures
+
+    @staticmethod
+    def _raise_failures(failures: dict[str, str]) -> None:
+        if not failures:
+            return
+        message = "\n".join(
+            f"Shard {name!r} failed:\n{trace}" for name, trace in failures.items()
+        )
+        raise ShardError(message, failures)
+
@@ -0,0 +1,263 @@
+from __future__ import annotations
+from beartype.typing import TYPE_CHECKING
+from beartype.typing import Any
+
+if TYPE_CHECKING:
+    from pecs_framework._types import CompId
+    from pecs_framework.domain import Domain
+
+from collections import deque
+from dataclasses import dataclass, field
+import copy
+
+from pecs_framework.component import Component
+from pecs_framework.entity import Entity
+from pecs_framework.entity import add_component
+from pecs_framework.entity import add_component_type
+from pecs_framework.entity import remove_component
+
+
+# Field values of these types are stored as-is; anything else is deep-copied
+# so later in-place changes to the live component cannot reach a snapshot.
+_IMMUTABLE = frozenset({int, float, str, bool, type(None), tuple, frozenset, bytes})
+
+# Objects owned by a Domain or the Engine rather than by the component that
+# refers to them. They are kept by reference, also inside lists, dicts and
+# sets, since copying one would copy the whole Domain with it.
+BY_REFERENCE = (Entity, Component, type)
+
+# Component state is its instance dict, or None for a tag component.
+ComponentState = dict[str, Any] | None
+EntityState = tuple[str | None, dict["CompId", ComponentState]]
+
+
+def copy_state(state: ComponentState) -> ComponentState:
+    if state is None:
+        return None
+    return {key: _copy_value(value) for key, value in state.items()}
+
+
+def _copy_value(value: Any) -> Any:
+    kind = type(value)
+    if kind in _IMMUTABLE or isinstance(value, BY_REFERENCE):
+        return value
+    if kind is list:
+        return [_copy_value(item) for item in value]
+    if kind is dict:
+        return {key: _copy_value(item) for key, item in value.items()}
+    if kind is set:
+        return {_copy_value(item) for item in value}
+    return copy.deepcopy(value)
+
+
+@dataclass
+class TickDiff:
+    """Entity states that changed, and entities that left, since the last tick."""
+    tick: int
+    changed: dict[str, EntityState] = field(default_factory=dict)
+    destroyed: list[str] = field(default_factory=list)
+
+    def apply(self, state: dict[str, EntityState]) -> None:
+        for eid in self.destroyed:
+            state.pop(eid, None)
+        state.update(self.changed)
+
+
+class SnapshotBuffer:
+    """
+    Ring buffer of the last `capacity` Domain ticks for rollback.
+
+    `capture` records the Domain's entities and component field values as
+    they are now, storing only the entities that differ from the previous
+    capture. The oldest diff is folded into a base state once the buffer is
+    full. `restore` puts the live Domain back into any retained tick in
+    place: entities are recreated or destroyed and components reattached,
+    removed or overwritten, so queries update their membership as usual.
+
+    Field values that are entities, components or classes are recorded by
+    reference. A restored reference to an entity that was destroyed and then
+    recreated by the restore still points at the old Entity object.
+
+    ```py
+    snapshots = domain.enable_snapshots(capacity=8)
+    for _ in range(100):
+        loop.update()
+        domain.advance_tick()
+        snapshots.capture()
+    snapshots.restore(domain.tick - 3)
+    ```
+    """
+
+    def __init__(self, domain: Domain, capacity: int = 60) -> None:
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self._domain = domain
+        self.capacity = capacity
+        self._base_tick: int | None = None
+        self._base: dict[str, EntityState] = {}
+        self._diffs: deque[TickDiff] = deque()
+        self._latest: dict[str, EntityState] = {}
+
+    def __len__(self) -> int:
+        return 0 if self._base_tick is None else len(self._diffs) + 1
+
+    def __contains__(self, tick: int) -> bool:
+        return tick in self.ticks
+
+    @property
+    def ticks(self) -> list[int]:
+        if self._base_tick is None:
+            return []
+        return [self._base_tick, *(diff.tick for diff in self._diffs)]
+
+    def clear(self) -> None:
+        self._base_tick = None
+        self._base = {}
+        self._diffs.clear()
+        self._latest = {}
+
+    def capture(self) -> int:
+        """
+        Record the Domain's current state under its current tick, replacing
+        any snapshot already held for that tick.
+
+        Returns
+        -------
+            The captured tick
+        """
+        tick = self._domain.tick
+        if tick in self:
+            self._drop_from(tick)
+
+        current = {
+            entity.eid: self._entity_state(entity)
+            for entity in self._domain.entities
+        }
+
+        if self._base_tick is None:
+            self._base_tick = tick
+            self._base = dict(current)
+            self._latest = current
+            return tick
+
+        diff = TickDiff(tick)
+        latest = self._latest
+        for eid, state in current.items():
+            if latest.get(eid) != state:
+                diff.changed[eid] = state
+        diff.destroyed = [eid for eid in latest if eid not in current]
+        self._diffs.append(diff)
+        self._latest = current
+
+        while len(self._diffs) >= self.capacity:
+            oldest = self._diffs.popleft()
+            oldest.apply(self._base)
+            self._base_tick = oldest.tick
+        return tick
+
+    def state_at(self, tick: int) -> dict[str, EntityState]:
+        if tick not in self:
+            raise KeyError(f"No snapshot held for tick {tick}")
+        state = dict(self._base)
+        for diff in self._diffs:
+            if diff.tick > tick:
+                break
+            diff.apply(state)
+        return state
+
+    def restore(self, tick: int) -> None:
+        """
+        Return the Domain to a captured tick. Snapshots after `tick` are
+        dropped, since the simulation diverges from them from here on.
+        """
+        domain = self._domain
+        if domain.deferring:
+            raise RuntimeError("Cannot restore a snapshot inside deferred()")
+
+        state = self.state_at(tick)
+        entities = domain.entities
+        for eid in [eid for eid in entities.keys() if eid not in state]:
+            alias = entities.eid_to_alias.get(eid)
+            if alias is not None:
+                entities.remove_entity_by_alias(alias)
+            else:
+                entities.remove_entity_by_id(eid)
+
+        for eid, (alias, components) in state.items():
+            if eid in entities.keys():
+                entity = entities.get_by_id(eid)
+                current = entities.eid_to_alias.get(eid)
+                if current != alias:
+                    if current is not None:
+                        del entities.alias_to_eid[current]
+                        del entities.eid_to_alias[eid]
+                    if alias is not None:
+                        entities.alias_to_eid[alias] = eid
+                        entities.eid_to_alias[eid] = alias
+            else:
+                entity = entities.create(alias, entity_id=eid)
+            self._restore_components(entity, components)
+
+        domain.tick = tick
+        while self._diffs and self._diffs[-1].tick > tick:
+            self._diffs.pop()
+        self._latest = state
+
+    def _entity_state(self, entity: Entity) -> EntityState:
+        components: dict[CompId, ComponentState] = {
+            comp_id: copy_state(vars(component))
+            for comp_id, component in entity.components.items()
+        }
+        registry = self._domain.engine.components
+        if registry.tags:
+            for tag in registry.tags_of(entity):
+                components[tag.comp_id] = None
+        alias = self._domain.entities.eid_to_alias.get(entity.eid)
+        return alias, components
+
+    def _restore_components(
+        self,
+        entity: Entity,
+        components: dict[CompId, ComponentState],
+    ) -> None:
+        registry = self._domain.engine.components
+        overwritten = False
+        present = set(entity.components)
+        present.update(tag.comp_id for tag in registry.tags_of(entity))
+
+        for comp_id in present - components.keys():
+            remove_component(entity, registry.get_type(comp_id))
+
+        for comp_id, state in components.items():
+            component_type = registry.get_type(comp_id)
+            if state is None:
+                if comp_id not in present:
+                    add_component_type(entity, component_type)
+                continue
+
+            instance = entity.components.get(comp_id)
+            if instance is not None and comp_id not in entity._shared:
+                if vars(instance) != state:
+                    vars(instance).clear()
+                    vars(instance).update(copy_state(state))
+                    overwritten = True
+                continue
+
+            if instance is not None:
+                # Shared with a fork: detach without touching the instance.
+                remove_component(entity, component_type)
+            restored = component_type.__new__(component_type)
+            vars(restored).update(copy_state(state))
+            add_component(entity, restored)
+
+        # Let change hooks (spatial indexes and the like) see the new values.
+        if overwritten:
+            self._domain.changed(entity)
+
+    def _drop_from(self, tick: int) -> None:
+        if self._base_tick is not None and self._base_tick >= tick:
+            self.clear()
+            return
+        while self._diffs and self._diffs[-1].tick >= tick:
+            self._diffs.pop()
+        self._latest = self.state_at(self.ticks[-1])
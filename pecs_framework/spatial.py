@@ -0,0 +1,230 @@
+from __future__ import annotations
+from beartype.typing import TYPE_CHECKING
+from beartype.typing import Callable
+from beartype.typing import Any
+
+if TYPE_CHECKING:
+    from pecs_framework.component import Component
+    from pecs_framework.component import ComponentMeta
+    from pecs_framework.domain import Domain
+    from pecs_framework.entity import Entity
+
+import heapq
+import math
+
+
+Point = tuple[float, float]
+Cell = tuple[int, int]
+
+
+def xy(component: Any) -> Point:
+    return component.x, component.y
+
+
+class SpatialGrid:
+    """
+    Uniform grid index over the entities that have a given position
+    component.
+
+    The grid follows the Domain through a shared Query: entities are added
+    when the component is attached, dropped when it is removed or the entity
+    is destroyed, and re-bucketed when the component is marked changed with
+    `entity.mark_changed`. Moving an entity without marking it leaves it in
+    its old cell until `rebuild` is called.
+
+    ```py
+    grid = SpatialGrid(domain, Position, cell_size=16)
+    nearby = grid.in_radius(player[Position].xy, 10)
+    ```
+    """
+
+    def __init__(
+        self,
+        domain: Domain,
+        component_type: ComponentMeta,
+        cell_size: float = 8.0,
+        *,
+        position: Callable[[Component], Point] = xy,
+    ) -> None:
+        if cell_size <= 0:
+            raise ValueError("cell_size must be positive")
+        self._domain = domain
+        self._component_type = component_type
+        self._position = position
+        self.cell_size = cell_size
+
+        self._cells: dict[Cell, dict[Entity, None]] = {}
+        self._entity_cells: dict[Entity, Cell] = {}
+
+        self._query = domain.create_query(all_of=[component_type])
+        self._query.on_enter(self._insert)
+        self._query.on_exit(self._remove)
+        self._query.on_change(self._move)
+        self.rebuild()
+
+    def __len__(self) -> int:
+        return len(self._entity_cells)
+
+    def __contains__(self, entity: Entity) -> bool:
+        return entity in self._entity_cells
+
+    def dispose(self) -> None:
+        self._query.dispose()
+        self._cells.clear()
+        self._entity_cells.clear()
+
+    def rebuild(self) -> None:
+        """Re-bucket every tracked entity from its current position."""
+        self._cells.clear()
+        self._entity_cells.clear()
+        for entity in self._query.result:
+            self._insert(entity)
+
+    def position_of(self, entity: Entity) -> Point:
+        return self._position(entity.components[self._component_type.comp_id])
+
+    def cell_of(self, point: Point) -> Cell:
+        return (
+            math.floor(point[0] / self.cell_size),
+            math.floor(point[1] / self.cell_size),
+        )
+
+    def in_rect(self, low: Point, high: Point) -> list[Entity]:
+        """Entities whose position lies within the inclusive rectangle."""
+        (x0, y0), (x1, y1) = low, high
+        c0, c1 = self.cell_of(low), self.cell_of(high)
+        found = []
+        for entity in self._scan(c0, c1):
+            x, y = self.position_of(entity)
+            if x0 <= x <= x1 and y0 <= y <= y1:
+                found.append(entity)
+        return found
+
+    def in_radius(self, center: Point, radius: float) -> list[Entity]:
+        """Entities within `radius` of `center`."""
+        cx, cy = center
+        c0 = self.cell_of((cx - radius, cy - radius))
+        c1 = self.cell_of((cx + radius, cy + radius))
+        limit = radius * radius
+        found = []
+        for entity in self._scan(c0, c1):
+            x, y = self.position_of(entity)
+            if (x - cx) ** 2 + (y - cy) ** 2 <= limit:
+                found.append(entity)
+        return found
+
+    def nearest(
+        self,
+        center: Point,
+        k: int = 1,
+        max_distance: float | None = None,
+        exclude: Entity | None = None,
+    ) -> list[Entity]:
+        """
+        Up to `k` entities closest to `center`, nearest first.
+
+        Searches outwards ring by ring from the cell containing `center` and
+        stops once no unvisited cell can hold anything closer, or once every
+        occupied cell has been visited. When the rings grow larger than the
+        number of occupied cells, the remaining occupied cells are scanned
+        directly instead.
+        """
+        cells = self._cells
+        if not cells or k <= 0:
+            return []
+
+        cx, cy = center
+        ox, oy = origin = self.cell_of(center)
+        xs = [cell[0] for cell in cells]
+        ys = [cell[1] for cell in cells]
+        max_ring = max(
+            abs(ox - min(xs)), abs(ox - max(xs)),
+            abs(oy - min(ys)), abs(oy - max(ys)),
+        )
+        limit = None
+        if max_distance is not None:
+            max_ring = min(max_ring, math.ceil(max_distance / self.cell_size))
+            limit = max_distance * max_distance
+
+        # Max-heap of the best k so far, as (-distance², tiebreak, entity).
+        best: list[tuple[float, int, Entity]] = []
+
+        def offer(bucket: dict[Entity, None]) -> None:
+            for entity in bucket:
+                if entity is exclude:
+                    continue
+                x, y = self.position_of(entity)
+                dist = (x - cx) ** 2 + (y - cy) ** 2
+                if limit is not None and dist > limit:
+                    continue
+                item = (-dist, -id(entity), entity)
+                if len(best) < k:
+                    heapq.heappush(best, item)
+                elif item > best[0]:
+                    heapq.heapreplace(best, item)
+
+        unvisited = len(cells)
+        for ring in range(max_ring + 1):
+            if not unvisited:
+                break
+            if len(best) == k:
+                reach = (ring - 1) * self.cell_size
+                if reach * reach > -best[0][0]:
+                    break
+            if (2 * ring + 1) ** 2 > len(cells):
+                for cell, bucket in cells.items():
+                    if max(abs(cell[0] - ox), abs(cell[1] - oy)) >= ring:
+                        offer(bucket)
+                break
+            for cell in self._ring(origin, ring):
+                bucket = cells.get(cell)
+                if bucket is not None:
+                    unvisited -= 1
+                    offer(bucket)
+
+        return [entity for _, _, entity in sorted(best, reverse=True)]
+
+    def _scan(self, c0: Cell, c1: Cell):
+        cells = self._cells
+        if (c1[0] - c0[0] + 1) * (c1[1] - c0[1] + 1) > len(cells):
+            for cell, entities in cells.items():
+                if c0[0] <= cell[0] <= c1[0] and c0[1] <= cell[1] <= c1[1]:
+                    yield from entities
+            return
+        for i in range(c0[0], c1[0] + 1):
+            for j in range(c0[1], c1[1] + 1):
+                yield from cells.get((i, j), ())
+
+    @staticmethod
+    def _ring(origin: Cell, ring: int):
+        ox, oy = origin
+        if ring == 0:
+            yield origin
+            return
+        for i in range(ox - ring, ox + ring + 1):
+            yield i, oy - ring
+            yield i, oy + ring
+        for j in range(oy - ring + 1, oy + ring):
+            yield ox - ring, j
+            yield ox + ring, j
+
+    def _insert(self, entity: Entity) -> None:
+        cell = self.cell_of(self.position_of(entity))
+        self._entity_cells[entity] = cell
+        self._cells.setdefault(cell, {})[entity] = None
+
+    def _remove(self, entity: Entity) -> None:
+        cell = self._entity_cells.pop(entity, None)
+        if cell is None:
+            return
+        bucket = self._cells[cell]
+        del bucket[entity]
+        if not bucket:
+            del self._cells[cell]
+
+    def _move(self, entity: Entity) -> None:
+        cell = self.cell_of(self.position_of(entity))
+        if self._entity_cells.get(entity) != cell:
+            self._remove(entity)
+            self._entity_cells[entity] = cell
+            self._cells.setdefault(cell, {})[entity] = None
@@ -1,11 +1,46 @@
+"""
+Benchmark suite for PECS.
+
+Run from the repository root:
+
+    python -m tests.benchmark
+    python -m tests.benchmark --only query --repeat 20 --json results.json
+    python -m tests.benchmark --compare results.json
+
+Every scenario is run `--warmup` times untimed and then `--repeat` times
+timed with `time.perf_counter`. Results are reported in milliseconds per
+repeat, and `--json` writes them out so runs from different commits can be
+compared with `--compare`.
+
+The `import` scenario times `import pecs_framework` in fresh interpreters
+with `-X importtime`, and the run fails if its median exceeds
+`--import-budget` milliseconds.
+"""
 from __future__ import annotations
+from beartype.typing import Any
+from beartype.typing import Callable
 
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
 import time
+from dataclasses import dataclass, asdict
+from functools import partial
+from pathlib import Path
+
 from pecs_framework import Engine
 from pecs_framework import Component
+from pecs_framework.component import ComponentMeta
 
-from dataclasses import dataclass
-from rich.console import Console
+
+TEST_DIR = Path(__file__).parent.resolve()
+PREFABS = Path(TEST_DIR, 'prefabs')
+IMPORT_BUDGET_MS = 250.0
+IMPORT_SCENARIO = "import[pecs_framework]"
 
 
 @dataclass
@@ -17,51 +52,397 @@ class ComponentA(Component):
 class ComponentB(Component):
     k: int = 0
 
+    def on_poke(self, evt) -> None:
+        self.k += 1
+
 
 @dataclass
 class ComponentC(Component):
     """Another simple component"""
 
 
-def test(iterations: int = 30, entity_count: int = 10000) -> None:
+@dataclass
+class Result:
+    name: str
+    repeat: int
+    mean: float
+    median: float
+    stdev: float
+    min: float
+    max: float
 
-    console = Console()
-    total_time: float = 0.0
 
-    for n in range(iterations):
+Setup = Callable[[], Any]
+Run = Callable[[Any], None]
 
-        ecs = Engine()
-        domain = ecs.create_domain("Benchmark")
 
-        ecs.components.register(ComponentA)
-        ecs.components.register(ComponentB)
-        ecs.components.register(ComponentC)
+def make_engine() -> Engine:
+    ecs = Engine()
+    ecs.create_domain("Benchmark")
+    ecs.components.register(ComponentA)
+    ecs.components.register(ComponentB)
+    ecs.components.register(ComponentC)
+    return ecs
 
-        domain.create_query(all_of=[ComponentA])
-        domain.create_query(all_of=[ComponentB])
-        domain.create_query(all_of=[ComponentC])
 
-        start = time.time() * 1000
+def populate(ecs: Engine, count: int) -> None:
+    for i in range(count):
+        entity = ecs.domain.entities.create()
+        ecs.components.attach(entity, ComponentA)
+        if i % 2:
+            ecs.components.attach(entity, ComponentB)
+        if i % 3:
+            ecs.components.attach(entity, ComponentC)
 
-        for i in range(entity_count):
-            entity = domain.entities.create(f"e{i}")
 
+def bench_create_destroy(count: int) -> tuple[Setup, Run]:
+    def setup() -> Engine:
+        ecs = make_engine()
+        ecs.domain.create_query(all_of=[ComponentA])
+        ecs.domain.create_query(all_of=[ComponentB])
+        ecs.domain.create_query(all_of=[ComponentC])
+        return ecs
+
+    def run(ecs: Engine) -> None:
+        domain = ecs.domain
+        for i in range(count):
+            entity = domain.entities.create(f"e{i}")
             ecs.components.attach(entity, ComponentA)
             ecs.components.attach(entity, ComponentB)
             ecs.components.attach(entity, ComponentC)
-
             domain.destroy_entity(entity)
 
-        end = time.time() * 1000
-        delta = end - start
+    return setup, run
+
+
+def bench_churn(count: int, queries: int) -> tuple[Setup, Run]:
+    # Equivalent queries are shared, so every query past the first four
+    # excludes a type of its own to keep all `queries` of them distinct.
+    extras = [
+        ComponentMeta(f"Churn{i}", (Component,), {})
+        for i in range(max(0, queries - 4))
+    ]
+
+    def setup() -> Engine:
+        ecs = make_engine()
+        for component in extras:
+            ecs.components.register(component)
+        populate(ecs, count)
+        shapes = [
+            {"all_of": [ComponentA]},
+            {"all_of": [ComponentA, ComponentB]},
+            {"any_of": [ComponentB, ComponentC]},
+            {"all_of": [ComponentA], "none_of": [ComponentC]},
+        ]
+        for i in range(queries):
+            shape = dict(shapes[i % len(shapes)])
+            if i >= len(shapes):
+                shape["none_of"] = [*shape.get("none_of", []), extras[i - 4]]
+            ecs.domain.create_query(**shape)
+        return ecs
+
+    def run(ecs: Engine) -> None:
+        for entity in list(ecs.domain.entities):
+            if ecs.components.has(entity, ComponentB):
+                ecs.components.remove(entity, ComponentB)
+            else:
+                ecs.components.attach(entity, ComponentB)
+
+    return setup, run
+
+
+def bench_query_iteration(count: int) -> tuple[Setup, Run]:
+    def setup() -> Any:
+        ecs = make_engine()
+        populate(ecs, count)
+        return ecs.domain.create_query(all_of=[ComponentA, ComponentB])
+
+    def run(query: Any) -> None:
+        for entity in query.result:
+            entity[ComponentB].k += 1
+
+    return setup, run
+
+
+def bench_query_creation(count: int) -> tuple[Setup, Run]:
+    def setup() -> Engine:
+        ecs = make_engine()
+        populate(ecs, count)
+        return ecs
+
+    def run(ecs: Engine) -> None:
+        query = ecs.domain.create_query(any_of=[ComponentB, ComponentC])
+        ecs.domain.release_query(query)
+
+    return setup, run
+
+
+def bench_events(count: int) -> tuple[Setup, Run]:
+    def setup() -> Engine:
+        ecs = make_engine()
+        populate(ecs, count)
+        return ecs
+
+    def run(ecs: Engine) -> None:
+        for entity in ecs.domain.entities:
+            entity.fire_event("poke")
+
+    return setup, run
+
+
+def bench_prefabs(count: int) -> tuple[Setup, Run]:
+    from tests.components import loader
+
+    def setup() -> Engine:
+        ecs = Engine(loader=loader)
+        ecs.create_domain("Benchmark")
+        ecs.components.load("tests.components")
+        for name in ("game_object", "character", "player"):
+            ecs.prefabs.register(PREFABS, name)
+        return ecs
+
+    def run(ecs: Engine) -> None:
+        for _ in range(count):
+            ecs.domain.entities.create_from_prefab("Player")
+
+    return setup, run
+
+
+def bench_sorted_query(count: int) -> tuple[Setup, Run]:
+    def layer(entity: Any) -> int:
+        return entity[ComponentB].k
+
+    def setup() -> Any:
+        ecs = make_engine()
+        populate(ecs, count)
+        query = ecs.domain.create_query(all_of=[ComponentB], sort_key=layer)
+        return query
+
+    def run(query: Any) -> None:
+        movers = query.result[::100]
+        for entity in movers:
+            entity[ComponentB].k = len(movers) - entity[ComponentB].k
+            entity.mark_changed(ComponentB)
+        for entity in query.result:
+            pass
+
+    return setup, run
+
+
+def bench_fork(count: int) -> tuple[Setup, Run]:
+    def setup() -> Engine:
+        ecs = make_engine()
+        populate(ecs, count)
+        return ecs
+
+    def run(ecs: Engine) -> None:
+        child = ecs.domain.fork()
+        for entity in list(child.entities)[::100]:
+            entity[ComponentA]
+
+    return setup, run
+
+
+def bench_snapshots(count: int, ticks: int) -> tuple[Setup, Run]:
+    def setup() -> Engine:
+        ecs = make_engine()
+        populate(ecs, count)
+        ecs.domain.enable_snapshots(capacity=ticks)
+        ecs.domain.snapshots.capture()
+        return ecs
+
+    def run(ecs: Engine) -> None:
+        domain = ecs.domain
+        movers = list(domain.entities)[::100]
+        for _ in range(ticks - 1):
+            for entity in movers:
+                if ecs.components.has(entity, ComponentB):
+                    entity[ComponentB].k += 1
+            domain.advance_tick()
+            domain.snapshots.capture()
+        domain.snapshots.restore(domain.snapshots.ticks[0])
+
+    return setup, run
+
+
+def bench_wide_registry(count: int, types: int) -> tuple[Setup, Run]:
+    components = [
+        ComponentMeta(f"Wide{i}", (Component,), {}) for i in range(types)
+    ]
+
+    def setup() -> Engine:
+        ecs = make_engine()
+        for component in components:
+            ecs.components.register(component)
+        ecs.domain.create_query(all_of=[components[-1]])
+        ecs.domain.create_query(any_of=components[-4:])
+        return ecs
+
+    def run(ecs: Engine) -> None:
+        for i in range(count):
+            entity = ecs.domain.entities.create()
+            ecs.components.attach(entity, ComponentA)
+            ecs.components.attach(entity, components[-1 - i % 4])
+
+    return setup, run
+
+
+def bench_save_load(count: int) -> tuple[Setup, Run]:
+    def setup() -> tuple[Engine, tempfile.TemporaryDirectory]:
+        ecs = make_engine()
+        populate(ecs, count)
+        # Removed when the state is dropped, outside the timed region.
+        return ecs, tempfile.TemporaryDirectory(prefix="pecs-benchmark-")
+
+    def run(state: tuple[Engine, tempfile.TemporaryDirectory]) -> None:
+        ecs, directory = state
+        ecs.domain.save(Path(directory.name), "benchmark")
+        ecs.domain.reset()
+        ecs.domain.load(Path(directory.name), "benchmark")
+
+    return setup, run
+
+
+def scenarios(scale: int) -> dict[str, tuple[Setup, Run]]:
+    return {
+        f"create_destroy[{scale}]": bench_create_destroy(scale),
+        f"churn[{scale},q=1]": bench_churn(scale, 1),
+        f"churn[{scale},q=16]": bench_churn(scale, 16),
+        f"query_iteration[{scale // 10}]": bench_query_iteration(scale // 10),
+        f"query_iteration[{scale}]": bench_query_iteration(scale),
+        f"query_iteration[{scale * 10}]": bench_query_iteration(scale * 10),
+        f"query_creation[{scale}]": bench_query_creation(scale),
+        f"events[{scale}]": bench_events(scale),
+        f"prefabs[{scale // 10}]": bench_prefabs(scale // 10),
+        f"save_load[{scale // 10}]": bench_save_load(scale // 10),
+        f"sorted_query[{scale}]": bench_sorted_query(scale),
+        f"fork[{scale}]": bench_fork(scale),
+        f"snapshots[{scale},t=10]": bench_snapshots(scale, 10),
+        f"wide_registry[{scale},t=300]": bench_wide_registry(scale, 300),
+    }
+
+
+def measure(
+    name: str,
+    setup: Setup,
+    run: Run,
+    repeat: int,
+    warmup: int,
+) -> Result:
+    for _ in range(warmup):
+        run(setup())
+
+    samples: list[float] = []
+    for _ in range(repeat):
+        state = setup()
+        start = time.perf_counter()
+        run(state)
+        samples.append((time.perf_counter() - start) * 1000)
+
+    return Result(
+        name=name,
+        repeat=repeat,
+        mean=statistics.fmean(samples),
+        median=statistics.median(samples),
+        stdev=statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        min=min(samples),
+        max=max(samples),
+    )
+
+
+def import_time(module: str = "pecs_framework") -> float:
+    """Cumulative milliseconds spent importing `module` in a new interpreter."""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+        cwd=TEST_DIR.parent,
+    )
+    for line in completed.stderr.splitlines():
+        _, cumulative, name = line.split("|")
+        if name.strip() == module:
+            return int(cumulative) / 1000
+    raise RuntimeError(f"{module} was not imported")
+
+
+def measure_import(repeat: int) -> Result:
+    samples = [import_time() for _ in range(repeat)]
+    return Result(
+        name=IMPORT_SCENARIO,
+        repeat=repeat,
+        mean=statistics.fmean(samples),
+        median=statistics.median(samples),
+        stdev=statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        min=min(samples),
+        max=max(samples),
+    )
+
+
+def report(results: list[Result], baseline: dict[str, Any] | None) -> None:
+    header = f"{'scenario':<28}{'median':>10}{'mean':>10}{'stdev':>9}{'min':>10}"
+    if baseline:
+        header += f"{'change':>10}"
+    print(header)
+
+    for result in results:
+        line = (
+            f"{result.name:<28}{result.median:>9.2f}ms{result.mean:>8.2f}ms"
+            f"{result.stdev:>7.2f}ms{result.min:>8.2f}ms"
+        )
+        if baseline and result.name in baseline:
+            before = baseline[result.name]["median"]
+            line += f"{(result.median - before) / before:>+10.1%}"
+        print(line)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--scale", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--only", default="", help="substring filter")
+    parser.add_argument("--json", type=Path, help="write results to a file")
+    parser.add_argument("--compare", type=Path, help="baseline results file")
+    parser.add_argument(
+        "--import-budget",
+        type=float,
+        default=IMPORT_BUDGET_MS,
+        help="maximum median import time in ms",
+    )
+    args = parser.parse_args(argv)
+
+    runners: dict[str, Callable[[], Result]] = {
+        name: partial(measure, name, setup, run, args.repeat, args.warmup)
+        for name, (setup, run) in scenarios(args.scale).items()
+    }
+    runners[IMPORT_SCENARIO] = partial(measure_import, args.repeat)
+    results = [
+        runner() for name, runner in runners.items() if args.only in name
+    ]
 
-        console.print(f"T{n} {round(delta)}ms")
-        total_time += delta
+    baseline = None
+    if args.compare:
+        baseline = json.loads(args.compare.read_text())["results"]
+    report(results, baseline)
 
-    avg = total_time / iterations
+    if args.json:
+        args.json.write_text(json.dumps({
+            "python": sys.version,
+            "platform": platform.platform(),
+            "scale": args.scale,
+            "results": {r.name: asdict(r) for r in results},
+        }, indent=4))
 
-    console.print(f"AVG({iterations}) {round(avg)}ms")
+    for result in results:
+        if result.name == IMPORT_SCENARIO and result.median > args.import_budget:
+            print(
+                f"{result.name} took {result.median:.1f}ms, over the "
+                f"{args.import_budget:.1f}ms budget"
+            )
+            return 1
+    return 0
 
 
 if __name__ == '__main__':
-    test(30, 10000)
+    sys.exit(main())
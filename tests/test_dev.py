@@ -3,14 +3,18 @@ from beartype.typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
     from pecs_framework.engine import Engine
+    from pecs_framework.entity import Entity
     from pecs_framework.prefab import EntityTemplate, ComponentTemplate
 
 import os
+import time
+from dataclasses import dataclass
 import pytest
 from pathlib import Path
 
 from pecs_framework import Engine
 from pecs_framework.base_system import BaseSystem, Loop
+from pecs_framework.component import Component
 
 from pecs_framework.entity import owns_component
 from pecs_framework.entity import get_component
@@ -55,7 +59,7 @@ class MockLoop(Loop):
         self.movement_system = MovementSystem(self)
 
     def teardown(self) -> None:
-        pass
+        super().teardown()
 
     def pre_update(self) -> None:
         pass
@@ -554,3 +558,1486 @@ def test_multi_inheritance(ecs: Engine) -> None:
 
     attacker: Attacker = get_component(combatant, Attacker)
     assert attacker.strength == 12
+
+
+def test_query_change_detection(ecs: Engine) -> None:
+    """
+    Test that a change-tracking Query records the entities that entered, left,
+    or had a component marked changed during the current tick, and that these
+    sets are cleared when the Domain advances.
+    """
+    domain = ecs.domain
+    e1 = domain.entities.get_by_alias('e1')
+    e2 = domain.entities.get_by_alias('e2')
+
+    movable = domain.create_query(
+        all_of = [Position, Velocity],
+        none_of = [IsFrozen],
+        track_changes = True,
+    )
+    assert list(movable.added) == [e1]
+
+    domain.advance_tick()
+    assert len(movable.added) == 0
+
+    ecs.components.remove(e2, IsFrozen)
+    ecs.components.attach(e1, IsFrozen)
+    assert list(movable.added) == [e2]
+    assert list(movable.removed) == [e1]
+
+    e2[Position].x += 1
+    e2.mark_changed(Position)
+    assert list(movable.changed) == [e2]
+    assert movable.changed_of(Position) == [e2]
+    assert movable.changed_of(Velocity) == []
+    assert e2[Position].changed_tick == domain.tick
+
+    domain.advance_tick()
+    assert len(movable.added) == 0
+    assert len(movable.removed) == 0
+    assert len(movable.changed) == 0
+
+
+def test_query_hooks(ecs: Engine) -> None:
+    """
+    Test that Query enter and exit hooks fire as entities start and stop
+    matching, including when an entity is destroyed.
+    """
+    domain = ecs.domain
+    e1 = domain.entities.get_by_alias('e1')
+    e2 = domain.entities.get_by_alias('e2')
+
+    movable = domain.create_query(
+        all_of = [Position, Velocity],
+        none_of = [IsFrozen],
+    )
+
+    index: dict[str, tuple[int, int]] = {}
+
+    @movable.on_enter
+    def enter(entity) -> None:
+        index[entity.eid] = entity[Position].xy
+
+    @movable.on_exit
+    def exit(entity) -> None:
+        del index[entity.eid]
+
+    ecs.components.remove(e2, IsFrozen)
+    assert index == {e2.eid: (10, 10)}
+
+    domain.destroy_entity(e2)
+    assert index == {}
+    assert e2 not in movable.result
+
+    movable.remove_hook(exit)
+    ecs.components.attach(e1, IsFrozen)
+    assert e1 not in movable.result
+
+
+def test_query_sharing(ecs: Engine) -> None:
+    """
+    Test that equivalent queries are shared by the Domain and only stop being
+    maintained once every holder has released them.
+    """
+    domain = ecs.domain
+
+    q1 = domain.create_query(all_of = [Position, Velocity])
+    q2 = domain.create_query(all_of = [Velocity, Position])
+    q3 = domain.create_query(all_of = [Position, Velocity], none_of = [IsFrozen])
+
+    assert q1.query is q2.query
+    assert q1.query is not q3.query
+    assert q1.refs == 2
+    assert len(domain.queries) == 2
+
+    domain.release_query(q1)
+    assert q1 in domain.queries
+
+    domain.release_query(q2)
+    assert q1 not in domain.queries
+    assert domain.create_query(all_of = [Position, Velocity]) != q1
+
+
+def test_query_handle_hooks(ecs: Engine) -> None:
+    """
+    Test that disposing one holder of a shared Query removes the hooks that
+    holder registered and leaves those of the other holders running.
+    """
+    domain = ecs.domain
+    e1 = domain.entities.get_by_alias('e1')
+    first = domain.create_query(all_of = [Position, IsFrozen])
+    second = domain.create_query(all_of = [IsFrozen, Position])
+    seen: list[str] = []
+
+    first.on_enter(lambda entity: seen.append('first'))
+    second.on_enter(lambda entity: seen.append('second'))
+    first.on_exit(lambda entity: seen.append('first exit'))
+
+    ecs.components.attach(e1, IsFrozen)
+    assert seen == ['first', 'second']
+
+    first.dispose()
+    assert first.disposed
+    assert not second.disposed
+    ecs.components.remove(e1, IsFrozen)
+    ecs.components.attach(e1, IsFrozen)
+    assert seen == ['first', 'second', 'second']
+
+
+def test_query_lifecycle(ecs: Engine) -> None:
+    """
+    Test that replacing a system query disposes of the old one and that
+    tearing down a loop stops the Domain from maintaining its queries.
+    """
+    domain = ecs.domain
+    test_loop = MockLoop(ecs, domain)
+    system = test_loop.movement_system
+
+    old = system._queries['movable']
+    system.query('movable', all_of = [Position])
+    assert old.disposed
+    assert old not in domain.queries
+
+    new = system._queries['movable']
+    assert new in domain.queries
+
+    test_loop.teardown()
+    assert new.disposed
+    assert new not in domain.queries
+    assert test_loop.systems == []
+
+
+def test_lazy_query(ecs: Engine) -> None:
+    """
+    Test that a lazy Query only records candidates on component changes and
+    reconciles its result when it is next read.
+    """
+    domain = ecs.domain
+    e1 = domain.entities.get_by_alias('e1')
+    e2 = domain.entities.get_by_alias('e2')
+
+    movable = domain.create_query(
+        all_of = [Position, Velocity],
+        none_of = [IsFrozen],
+        lazy = True,
+    )
+    assert movable.dirty
+    assert list(movable.result) == [e1]
+    assert not movable.dirty
+
+    ecs.components.remove(e2, IsFrozen)
+    ecs.components.attach(e1, IsFrozen)
+    assert movable.dirty
+    assert movable._cache == [e1]
+
+    assert list(movable.result) == [e2]
+    assert not movable.dirty
+
+
+def test_lazy_query_destroy_and_changes(ecs: Engine) -> None:
+    """
+    Test that a lazy Query runs exit hooks for a destroyed entity while its
+    components are still attached, and only reports changes for members.
+    """
+    domain = ecs.domain
+    e1 = domain.entities.get_by_alias('e1')
+    e2 = domain.entities.get_by_alias('e2')
+
+    movable = domain.create_query(
+        all_of = [Position, Velocity],
+        none_of = [IsFrozen],
+        track_changes = True,
+        lazy = True,
+    )
+    assert list(movable.result) == [e1]
+    domain.advance_tick()
+
+    exits: list[tuple[int, int]] = []
+    movable.on_exit(lambda entity: exits.append(entity[Position].xy))
+    domain.destroy_entity(e1)
+    assert exits == [(10, 10)]
+    assert list(movable.removed) == [e1]
+
+    ecs.components.attach(e2, Renderable)
+    e2.mark_changed(Position)
+    assert list(movable.changed) == []
+    assert list(movable.result) == []
+
+
+class ScheduledMovement(MovementSystem):
+    reads = (Velocity, IsFrozen)
+    writes = (Position,)
+
+
+class ScheduledRender(BaseSystem):
+    reads = (Position, Renderable)
+
+    def initialize(self) -> None:
+        self.query('renderable', all_of = [Position, Renderable])
+
+    def update(self) -> None:
+        self.drawn = [e[Position].xy for e in self._queries['renderable'].result]
+
+
+class ScheduledCombat(BaseSystem):
+    reads = (Attacker,)
+    writes = (Health,)
+
+    def initialize(self) -> None:
+        pass
+
+    def update(self) -> None:
+        pass
+
+
+class ScheduledRegen(BaseSystem):
+    writes = (Health,)
+    after = (ScheduledRender,)
+
+    def initialize(self) -> None:
+        pass
+
+    def update(self) -> None:
+        pass
+
+
+class ScheduledLoop(MockLoop):
+
+    def initialize(self) -> None:
+        self.render_system = ScheduledRender(self)
+        self.regen_system = ScheduledRegen(self)
+        self.movement_system = ScheduledMovement(self)
+        self.combat_system = ScheduledCombat(self)
+
+    def update(self) -> None:
+        self.scheduler.run()
+
+
+def test_system_scheduler(ecs: Engine) -> None:
+    """
+    Test that the Scheduler orders systems by declared component access and
+    explicit dependencies, grouping non-conflicting systems into stages.
+    """
+    test_loop = ScheduledLoop(ecs, ecs.domain)
+    render = test_loop.render_system
+    regen = test_loop.regen_system
+    movement = test_loop.movement_system
+    combat = test_loop.combat_system
+
+    stages = test_loop.scheduler.stages
+    assert stages == [[render], [regen, movement], [combat]]
+    assert test_loop.scheduler.order == [render, regen, movement, combat]
+
+    test_loop.update()
+    assert render.drawn[0] == (10, 10)
+    assert ecs.domain.entities.get_by_alias('e1')[Position].xy == (11, 11)
+
+
+def test_system_scheduler_cycle(ecs: Engine) -> None:
+    """
+    Test that contradictory `after` dependencies are reported.
+    """
+
+    class First(ScheduledCombat):
+        after = (ScheduledRegen,)
+
+    class CyclicRegen(ScheduledRegen):
+        after = (First,)
+
+    class CyclicLoop(MockLoop):
+
+        def initialize(self) -> None:
+            CyclicRegen(self)
+            First(self)
+
+    with pytest.raises(ValueError):
+        CyclicLoop(ecs, ecs.domain).scheduler
+
+
+def test_deferred_structural_changes(ecs: Engine) -> None:
+    """
+    Test that structural changes made while a Domain is deferring are applied
+    in order once the deferral block exits.
+    """
+    domain = ecs.domain
+    e1 = domain.entities.get_by_alias('e1')
+    e2 = domain.entities.get_by_alias('e2')
+
+    with domain.deferred():
+        ecs.components.attach(e1, IsFrozen)
+        ecs.components.remove(e2, IsFrozen)
+        domain.destroy_entity('e3')
+        assert not ecs.components.has(e1, IsFrozen)
+        assert ecs.components.has(e2, IsFrozen)
+        assert 'e3' in domain.entities.alias_to_eid
+
+    assert ecs.components.has(e1, IsFrozen)
+    assert not ecs.components.has(e2, IsFrozen)
+    assert 'e3' not in domain.entities.alias_to_eid
+
+
+def test_deferred_changes_to_destroyed(ecs: Engine) -> None:
+    """
+    Test that deferred changes to an entity destroyed earlier in the same
+    block are dropped without affecting the commands queued after them.
+    """
+    domain = ecs.domain
+    e1 = domain.entities.get_by_alias('e1')
+    e2 = domain.entities.get_by_alias('e2')
+
+    with domain.deferred():
+        domain.destroy_entity(e1)
+        ecs.components.attach(e1, Noun)
+        ecs.components.remove(e1, Position)
+        e1.mark_changed(Position)
+        domain.destroy_entity('e1')
+        ecs.components.attach(e2, Renderable)
+
+    assert 'e1' not in domain.entities.alias_to_eid
+    assert ecs.components.has(e2, Renderable)
+
+
+def test_deferred_changes_and_creation(ecs: Engine) -> None:
+    """
+    Test that change notifications made while deferring reach queries only
+    when the block exits, and that entities can be created from several
+    threads inside the block.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    domain = ecs.domain
+    ordered = domain.create_query(all_of = [Position], sort_key = by_x)
+    tracked = domain.create_query(all_of = [Position], track_changes = True)
+    moved = []
+    ordered.on_change(moved.append)
+    first = ordered.result[0]
+
+    with domain.deferred():
+        first[Position].x = 1000
+        first.mark_changed(Position)
+        assert ordered.result[0] is first
+        assert moved == []
+        assert first not in tracked.changed
+
+        with ThreadPoolExecutor(max_workers = 4) as pool:
+            spawned = list(pool.map(
+                lambda i: domain.entities.create(f"spawned{i}"),
+                range(200),
+            ))
+
+    assert ordered.result[-1] is first
+    assert moved == [first]
+    assert first in tracked.changed
+    assert len(set(spawned)) == 200
+    aliases = domain.entities.alias_to_eid
+    assert all(f"spawned{i}" in aliases for i in range(200))
+
+
+class FreezingSystem(BaseSystem):
+    reads = (Velocity,)
+    writes = (IsFrozen,)
+
+    def initialize(self) -> None:
+        self.query('moving', all_of = [Velocity], none_of = [IsFrozen])
+
+    def update(self) -> None:
+        for entity in self._queries['moving'].result:
+            self.loop.ecs.components.attach(entity, IsFrozen)
+
+
+def test_threaded_loop(ecs: Engine) -> None:
+    """
+    Test that a ThreadedLoop runs non-conflicting systems in the same stage
+    and applies their structural changes after the stage.
+    """
+    from pecs_framework.parallel import ThreadedLoop
+
+    class ParallelLoop(ThreadedLoop):
+
+        def initialize(self) -> None:
+            self.render_system = ScheduledRender(self)
+            self.freezing_system = FreezingSystem(self)
+            self.combat_system = ScheduledCombat(self)
+
+    test_loop = ParallelLoop(ecs, ecs.domain, max_workers = 4)
+    assert len(test_loop.scheduler.stages) == 1
+
+    test_loop.update()
+    assert len(test_loop.render_system.drawn) == 5
+    assert ecs.components.has(ecs.domain.entities.get_by_alias('e1'), IsFrozen)
+
+    test_loop.teardown()
+    assert test_loop.systems == []
+
+
+class FailingSystem(BaseSystem):
+    reads = (Health,)
+
+    def initialize(self) -> None:
+        pass
+
+    def update(self) -> None:
+        raise ValueError("system failed")
+
+
+class SlowFreezingSystem(BaseSystem):
+    reads = (Noun,)
+    writes = (IsFrozen,)
+
+    def initialize(self) -> None:
+        pass
+
+    def update(self) -> None:
+        time.sleep(0.05)
+        e1 = self.loop.domain.entities.get_by_alias('e1')
+        self.loop.ecs.components.attach(e1, IsFrozen)
+
+
+def test_threaded_loop_failure(ecs: Engine) -> None:
+    """
+    Test that a system raising in a threaded stage waits for the rest of the
+    stage and discards every structural change the stage made.
+    """
+    from pecs_framework.parallel import ThreadedLoop
+
+    class FailingLoop(ThreadedLoop):
+
+        def initialize(self) -> None:
+            self.failing_system = FailingSystem(self)
+            self.slow_system = SlowFreezingSystem(self)
+
+    e1 = ecs.domain.entities.get_by_alias('e1')
+    test_loop = FailingLoop(ecs, ecs.domain, max_workers = 2)
+    assert len(test_loop.scheduler.stages) == 1
+
+    with pytest.raises(ValueError):
+        test_loop.update()
+    time.sleep(0.1)
+    assert not ecs.domain.deferring
+    assert not ecs.components.has(e1, IsFrozen)
+    test_loop.teardown()
+
+
+def setup_shard(shard) -> Engine:
+    ecs = Engine(loader = loader)
+    ecs.create_domain(shard.name)
+    ecs.components.load("tests.components")
+    if shard.name == 'west':
+        entity = ecs.domain.entities.create('traveller')
+        ecs.components.attach(entity, Position(3, 4))
+        ecs.components.attach(entity, Health(50))
+    return ecs
+
+
+def step_shard(shard) -> None:
+    if shard.name == 'west' and shard.tick == 0:
+        traveller = shard.domain.entities.get_by_alias('traveller')
+        shard.transfer(traveller, 'east')
+        shard.send_event('east', 'traveller', 'damage_taken', {'amount': 5})
+
+
+def inspect_traveller(shard) -> tuple[tuple[int, int], int] | None:
+    if 'traveller' not in shard.domain.entities.alias_to_eid:
+        return None
+    traveller = shard.domain.entities.get_by_alias('traveller')
+    return traveller[Position].xy, traveller[Health].current
+
+
+def test_shard_pool() -> None:
+    """
+    Test that a ShardPool steps domains in separate processes and delivers
+    entity transfers and cross-shard events on the following step.
+    """
+    from pecs_framework.sharding import ShardPool
+
+    with ShardPool(['west', 'east'], setup_shard, step_shard) as pool:
+        assert pool.call('west', inspect_traveller) == ((3, 4), 50)
+
+        pool.step()
+        assert pool.call('west', inspect_traveller) is None
+        assert pool.call('east', inspect_traveller) is None
+
+        pool.step()
+        assert pool.call('east', inspect_traveller) == ((3, 4), 45)
+
+
+def failing_step_shard(shard) -> None:
+    if shard.name != 'east':
+        raise ValueError(f"{shard.name} failed")
+
+
+def test_shard_pool_failures() -> None:
+    """
+    Test that a failed step reads every shard's reply and reports all of
+    the failures at once, leaving the pool usable.
+    """
+    from pecs_framework.sharding import ShardError, ShardPool
+
+    names = ['west', 'east', 'south']
+    with ShardPool(names, setup_shard, failing_step_shard) as pool:
+        with pytest.raises(ShardError) as info:
+            pool.step()
+        assert set(info.value.failures) == {'west', 'south'}
+        assert 'south failed' in str(info.value)
+
+        assert pool.call('east', inspect_traveller) is None
+        assert pool.call('west', inspect_traveller) == ((3, 4), 50)
+
+
+def leaving_step_shard(shard) -> None:
+    if shard.name == 'west' and shard.tick == 0:
+        traveller = shard.domain.entities.get_by_alias('traveller')
+        shard.transfer(traveller, 'east')
+        raise ValueError("west failed after transferring")
+
+
+def shard_tick(shard) -> int:
+    return shard.tick
+
+
+def test_shard_pool_failed_step() -> None:
+    """
+    Test that a failed step still advances the pool and the failed shard,
+    and delivers what the shard queued before failing.
+    """
+    from pecs_framework.sharding import ShardError, ShardPool
+
+    with ShardPool(['west', 'east'], setup_shard, leaving_step_shard) as pool:
+        with pytest.raises(ShardError, match = 'west failed'):
+            pool.step()
+        assert pool.tick == 1
+        assert pool.call('west', shard_tick) == 1
+        assert pool.call('east', shard_tick) == 1
+
+        pool.step()
+        assert pool.call('east', inspect_traveller) == ((3, 4), 50)
+
+
+def failing_setup_shard(shard) -> Engine:
+    if shard.name == 'east':
+        raise ValueError("east setup failed")
+    return setup_shard(shard)
+
+
+def test_shard_pool_failed_setup() -> None:
+    """
+    Test that a failed setup stops the workers that did start.
+    """
+    import multiprocessing
+    from pecs_framework.sharding import ShardError, ShardPool
+
+    with pytest.raises(ShardError, match = 'east setup failed'):
+        ShardPool(['west', 'east'], failing_setup_shard, step_shard)
+    assert not [
+        process for process in multiprocessing.active_children()
+        if process.name.startswith('pecs-shard-')
+    ]
+
+
+def total_x(chunk: list[tuple[int, int]]) -> int:
+    return sum(xy[0] for xy in chunk)
+
+
+def test_query_map_chunks(ecs: Engine) -> None:
+    """
+    Test that a Query result can be partitioned and mapped over in parallel,
+    with structural changes deferred until all chunks are done.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    domain = ecs.domain
+    positioned = domain.create_query(all_of = [Position])
+
+    assert [len(c) for c in positioned.chunks(2)] == [2, 2, 1]
+
+    def freeze(chunk) -> int:
+        for entity in chunk:
+            ecs.components.attach(entity, IsFrozen)
+            assert not ecs.components.has(entity, Noun)
+            ecs.components.attach(entity, Noun)
+        return len(chunk)
+
+    assert positioned.map_chunks(freeze, 2) == [2, 2, 1]
+    assert all(ecs.components.has(e, Noun) for e in positioned.result)
+
+    with ProcessPoolExecutor(max_workers = 2) as pool:
+        totals = positioned.map_chunks(
+            total_x,
+            2,
+            executor = pool,
+            extract = lambda entity: entity[Position].xy,
+        )
+    assert totals == [20, 20, 10]
+
+
+def test_query_map_chunks_failure(ecs: Engine) -> None:
+    """
+    Test that a failing chunk is raised only after the other chunks have
+    finished, and that the structural changes of the stage are discarded.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    domain = ecs.domain
+    positioned = domain.create_query(all_of = [Position])
+    members = list(positioned.result)
+    finished = []
+
+    def freeze(chunk) -> int:
+        if chunk[0] is members[0]:
+            raise RuntimeError('chunk failed')
+        time.sleep(0.05)
+        for entity in chunk:
+            ecs.components.attach(entity, Noun)
+        finished.append(chunk)
+        return len(chunk)
+
+    with ThreadPoolExecutor(max_workers = 3) as pool:
+        with pytest.raises(RuntimeError, match = 'chunk failed'):
+            positioned.map_chunks(freeze, 2, executor = pool)
+        assert len(finished) == 2
+    assert not any(ecs.components.has(e, Noun) for e in members)
+
+
+class CountingSystem(BaseSystem):
+    reads = (Noun,)
+
+    def initialize(self) -> None:
+        self.runs = 0
+
+    def update(self) -> None:
+        self.runs += 1
+
+
+class EveryThirdSystem(CountingSystem):
+    interval = 3
+
+
+class SlowSystem(CountingSystem):
+    reads = (Attacker,)
+
+    def update(self) -> None:
+        super().update()
+        self.loop.now += 0.01
+
+
+class CosmeticSystem(CountingSystem):
+    reads = (Renderable,)
+    low_priority = True
+
+
+class RunnerLoop(MockLoop):
+
+    def initialize(self) -> None:
+        self.now = 0.0
+        self.every = CountingSystem(self)
+        self.third = EveryThirdSystem(self)
+        self.slow = SlowSystem(self)
+        self.cosmetic = CosmeticSystem(self)
+
+    def update(self) -> None:
+        self.scheduler.run()
+
+
+def test_fixed_timestep_runner(ecs: Engine) -> None:
+    """
+    Test fixed-step catch-up, per-system intervals and frame budget deferral
+    of low priority systems.
+    """
+    from pecs_framework.runner import FixedTimestepRunner
+
+    test_loop = RunnerLoop(ecs, ecs.domain)
+    test_loop.scheduler.clock = lambda: test_loop.now
+    runner = FixedTimestepRunner(
+        test_loop,
+        timestep = 0.1,
+        max_steps = 4,
+        clock = lambda: test_loop.now,
+    )
+
+    assert runner.advance(0.25) == 2
+    assert runner.alpha == pytest.approx(0.5)
+    assert runner.advance(1.0) == 4
+    assert runner.dropped == pytest.approx(0.6)
+
+    assert ecs.domain.tick == 6
+    assert test_loop.every.runs == 6
+    assert test_loop.third.runs == 2
+    assert test_loop.cosmetic.runs == 6
+
+    runner.budget = 0.005
+    runner.advance(0.1)
+    assert test_loop.slow.runs == 7
+    assert test_loop.cosmetic.runs == 6
+    assert test_loop.cosmetic in test_loop.scheduler.skipped
+
+    runner.budget = None
+    runner.advance(0.1)
+    assert test_loop.cosmetic.runs == 7
+    assert test_loop.scheduler.skipped == {}
+
+
+def test_profiling(ecs: Engine, tmp_path: Path) -> None:
+    """
+    Test that an attached Profiler records system updates, query candidacy
+    and events, and that it can be dumped to a file.
+    """
+    domain = ecs.domain
+    profiler = domain.enable_profiling()
+
+    test_loop = ScheduledLoop(ecs, domain)
+    test_loop.update()
+
+    e1 = domain.entities.get_by_alias('e1')
+    e1.fire_event('attack', {
+        'target': domain.entities.get_by_alias('e2'),
+        'multiplier': 1.0,
+    })
+    ecs.components.attach(e1, Noun)
+
+    stats = profiler.snapshot(domain)
+    assert stats['entities'] == 5
+    assert stats['components']['POSITION'] == 5
+    assert stats['systems']['ScheduledMovement']['calls'] == 1
+    assert set(stats['events']) == {'attack', 'damage_taken'}
+    assert stats['events']['attack']['count'] == 1
+    assert stats['queries']['updates'][
+        "all_of=['Position', 'Velocity'], none_of=['IsFrozen']"
+    ]['calls'] == 1
+
+    # Queries differing only in their options, or in sort keys of the same
+    # name, are reported separately; lazy queries are timed as they reconcile.
+    eager = domain.create_query(all_of = [Noun])
+    lazy = domain.create_query(all_of = [Noun], lazy = True)
+    domain.create_query(all_of = [Noun], sort_key = lambda e: 0)
+    domain.create_query(all_of = [Noun], sort_key = lambda e: 1)
+    ecs.components.remove(e1, Noun)
+    assert e1 not in lazy.result
+    assert e1 not in eager.result
+
+    stats = profiler.snapshot(domain)
+    updates = stats['queries']['updates']
+    assert updates["all_of=['Noun']"]['calls'] == 1
+    assert updates["all_of=['Noun'], lazy=True"]['calls'] == 2
+    assert "all_of=['Noun'], sort_key=<lambda> #2" in updates
+    assert len(stats['queries']['results']) == stats['queries']['count']
+
+    profiler.dump(domain, tmp_path / 'stats.json')
+    assert json.loads((tmp_path / 'stats.json').read_text())['tick'] == 0
+
+    assert domain.disable_profiling() is profiler
+    e1.fire_event('attack', {
+        'target': domain.entities.get_by_alias('e2'),
+        'multiplier': 1.0,
+    })
+    assert profiler.events['attack'] == 1
+
+
+def test_benchmark_suite(tmp_path: Path) -> None:
+    """Smoke test the benchmark suite at a tiny scale."""
+    from tests import benchmark
+
+    output = tmp_path / 'results.json'
+    args = ['--scale', '20', '--repeat', '2', '--warmup', '0']
+    assert benchmark.main(args + ['--json', str(output)]) == 0
+
+    results = json.loads(output.read_text())['results']
+    assert 'churn[20,q=16]' in results
+    assert benchmark.main(args + ['--only', 'events', '--compare', str(output)]) == 0
+    assert 'import[pecs_framework]' in results
+    assert benchmark.main(args + ['--only', 'import', '--import-budget', '0']) == 1
+
+
+def test_import_is_lightweight() -> None:
+    """
+    Test that importing the package does not pull in debugging or validation
+    helpers that a simulation does not need.
+    """
+    import subprocess
+    import sys
+
+    code = (
+        "import sys, pecs_framework; "
+        "print(' '.join(m for m in ('rich', 'beartype.vale') if m in sys.modules))"
+    )
+    completed = subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output = True,
+        text = True,
+        check = True,
+        cwd = Path(__file__).parent.parent,
+    )
+    assert completed.stdout.strip() == ''
+
+
+def test_memory_report(ecs: Engine) -> None:
+    """
+    Test that memory reports account for every entity, component type, query
+    and registry map in a Domain.
+    """
+    domain = ecs.domain
+    domain.create_query(all_of = [Position, Velocity])
+
+    report = domain.memory_report()
+    assert report.entities.count == 5
+    assert report.components['POSITION'].count == 5
+    assert report.components['ISFROZEN'].count == 4
+    assert report.components['RENDERABLE'].bytes > 0
+    assert report.queries["all_of=['Position', 'Velocity']"].count == 5
+    assert report.registries['components'].count == 7
+    assert report.total > report.entities.bytes
+
+    ecs.create_domain('Empty')
+    reports = ecs.memory_report()
+    assert reports['Empty'].entities.count == 0
+    assert reports['World'].as_dict()['total'] == report.total
+
+
+def test_pooling(ecs: Engine) -> None:
+    """
+    Test that destroyed entities and removed component instances are
+    recycled when pooling is enabled, and come back reset.
+    """
+    domain = ecs.domain
+    domain.entities.enable_pool(8)
+    ecs.components.enable_pool(Health, 8)
+
+    entity = domain.entities.create('projectile')
+    ecs.components.attach(entity, Health, {'maximum': 5})
+    health = entity[Health]
+    health.current = 1
+
+    old_eid = entity.eid
+    domain.destroy_entity(entity)
+    assert health.entity_id == ''
+    domain.advance_tick()
+
+    reused = domain.entities.create('projectile')
+    assert reused is entity
+    assert reused.eid != old_eid
+    assert reused.components == {}
+    assert not ecs.components.has(reused, Health)
+
+    ecs.components.attach(reused, Health, {'maximum': 20})
+    assert reused[Health] is health
+    assert health.current == 20
+    assert health.entity_id == reused.eid
+
+    ecs.components.remove(reused, Health)
+    ecs.components.attach(domain.entities.get_by_alias('e1'), Health)
+    assert health.entity_id == domain.entities.get_by_alias('e1').eid
+    assert health.maximum == 100
+
+
+def test_pooling_change_tracking(ecs: Engine) -> None:
+    """
+    Test that a destroyed entity is not reused within the tick it was
+    destroyed in, so change-tracking queries still see it leave.
+    """
+    domain = ecs.domain
+    domain.entities.enable_pool(8)
+    tracked = domain.create_query(all_of = [Health], track_changes = True)
+
+    first = domain.entities.create('first')
+    ecs.components.attach(first, Health)
+    domain.advance_tick()
+
+    domain.destroy_entity(first)
+    second = domain.entities.create('second')
+    ecs.components.attach(second, Health)
+    assert second is not first
+    assert list(tracked.removed) == [first]
+    assert list(tracked.added) == [second]
+
+    domain.advance_tick()
+    assert domain.entities.create('third') is first
+
+
+def test_component_order(ecs: Engine) -> None:
+    """
+    Test that entity and registry maps keep insertion order, which event
+    dispatch and serialization depend on.
+    """
+    e1 = ecs.domain.entities.get_by_alias('e1')
+    assert type(e1.components) is dict
+    assert list(e1.components) == [
+        'POSITION', 'VELOCITY', 'RENDERABLE', 'HEALTH', 'ATTACKER',
+    ]
+    assert list(ecs.domain.entities.alias_to_eid) == ['e1', 'e2', 'e3', 'e4', 'e5']
+
+
+def test_spatial_grid(ecs: Engine) -> None:
+    """
+    Test that a SpatialGrid tracks Position attach/remove/changes and answers
+    rectangle, radius and nearest-neighbour queries.
+    """
+    from pecs_framework.spatial import SpatialGrid
+
+    domain = ecs.domain
+    grid = SpatialGrid(domain, Position, cell_size = 4)
+    assert len(grid) == 5
+
+    points = {'a': (0, 0), 'b': (3, 4), 'c': (20, 20), 'd': (-7, 1)}
+    placed = {}
+    for alias, (x, y) in points.items():
+        placed[alias] = domain.entities.create(alias)
+        ecs.components.attach(placed[alias], Position(x, y))
+
+    e1 = domain.entities.get_by_alias('e1')
+    assert set(grid.in_rect((0, 0), (10, 10))) >= {placed['a'], placed['b'], e1}
+    assert set(grid.in_radius((0, 0), 5)) == {placed['a'], placed['b']}
+    assert grid.nearest((0, 0), k = 2) == [placed['a'], placed['b']]
+    assert grid.nearest((0, 0), exclude = placed['a']) == [placed['b']]
+    assert grid.nearest((19, 19), max_distance = 3) == [placed['c']]
+
+    placed['c'][Position].x = -1
+    placed['c'][Position].y = -1
+    placed['c'].mark_changed(Position)
+    assert grid.nearest((0, 0), k = 2) == [placed['a'], placed['c']]
+
+    ecs.components.remove(placed['a'], Position)
+    domain.destroy_entity(placed['c'])
+    assert grid.nearest((0, 0)) == [placed['b']]
+    assert placed['a'] not in grid
+
+    grid.dispose()
+    assert len(grid) == 0
+
+
+def test_spatial_grid_sparse_nearest(
+    ecs: Engine,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """
+    Test that `nearest` on a few widely spread entities does not walk every
+    ring out to the far edge when fewer than `k` entities exist.
+    """
+    from pecs_framework.spatial import SpatialGrid
+
+    domain = ecs.domain
+    grid = SpatialGrid(domain, Position, cell_size = 1)
+    far = domain.entities.create('far')
+    ecs.components.attach(far, Position(100000, -100000))
+
+    rings = []
+    walk = SpatialGrid._ring
+    monkeypatch.setattr(
+        SpatialGrid,
+        '_ring',
+        staticmethod(lambda origin, ring: rings.append(ring) or walk(origin, ring)),
+    )
+    found = grid.nearest((0, 0), k = 50)
+    assert found[-1] is far
+    assert len(found) == len(grid)
+    assert len(rings) < 10
+
+
+class IsBurning(Component, tag = True):
+    """Tag Component denoting an entity that is on fire."""
+
+
+class IsBurningBrightly(IsBurning):
+    """Inherits tag-ness from IsBurning."""
+
+
+def test_tag_components(ecs: Engine, tmp_path: Path) -> None:
+    """
+    Test that tag components only set the entity's bit, take part in queries,
+    and survive a save/load round trip without ever being instantiated.
+    """
+    assert IsBurning.is_tag
+    assert IsBurningBrightly.is_tag
+    assert not Position.is_tag
+
+    domain = ecs.domain
+    ecs.components.register(IsBurning)
+    e1 = domain.entities.get_by_alias('e1')
+
+    burning = domain.create_query(all_of = [IsBurning])
+    ecs.components.attach(e1, IsBurning)
+    assert ecs.components.has(e1, IsBurning)
+    assert 'ISBURNING' not in e1.components
+    assert list(burning.result) == [e1]
+    assert ecs.components.tags_of(e1) == [IsBurning]
+
+    domain.save(tmp_path, 'tags')
+    domain.reset()
+    domain.load(tmp_path, 'tags')
+    loaded = domain.entities.get_by_alias('e1')
+    assert ecs.components.has(loaded, IsBurning)
+
+    ecs.components.remove(loaded, IsBurning)
+    assert not ecs.components.has(loaded, IsBurning)
+
+
+def test_archetypes(ecs: Engine) -> None:
+    """
+    Test that entities with the same component set share one interned
+    Archetype and that membership still resolves with hundreds of component
+    types registered.
+    """
+    from pecs_framework.component import ComponentMeta
+
+    domain = ecs.domain
+    e1 = domain.entities.get_by_alias('e1')
+    e2 = domain.entities.create('archetype_twin')
+    for comp_id in e1.components:
+        ecs.components.attach(e2, comp_id)
+    assert e1.archetype is e2.archetype
+    assert e1.cbits == e2.cbits
+
+    wide = [ComponentMeta(f"Wide{i}", (Component,), {}) for i in range(300)]
+    for component in wide:
+        ecs.components.register(component)
+    assert wide[-1].cbit > 300
+
+    last = domain.create_query(all_of = [wide[-1]], none_of = [wide[0]])
+    ecs.components.attach(e2, wide[-1])
+    assert e2.archetype is not e1.archetype
+    assert ecs.components.has(e2, wide[-1])
+    assert list(last.result) == [e2]
+
+    ecs.components.remove(e2, wide[-1])
+    assert e2.archetype is e1.archetype
+    assert list(last.result) == []
+
+
+def test_query_creation_order(ecs: Engine) -> None:
+    """
+    Test that a newly built Query lists its members in creation order even
+    though they are spread over several archetypes.
+    """
+    domain = ecs.domain
+    for index in range(6):
+        entity = domain.entities.create(f"ordered{index}")
+        ecs.components.attach(entity, Position)
+        if index % 2:
+            ecs.components.attach(entity, Velocity)
+        if index % 3:
+            ecs.components.attach(entity, Noun)
+
+    positioned = domain.create_query(all_of = [Position])
+    sorted_too = domain.create_query(all_of = [Position], sort_key = lambda e: 0)
+    expected = [e for e in domain.entities if ecs.components.has(e, Position)]
+    assert len({e.archetype for e in expected}) > 2
+    assert list(positioned.result) == expected
+    assert list(sorted_too.result) == expected
+
+
+def test_query_refresh_by_archetype(ecs: Engine) -> None:
+    """
+    Test that building a query evaluates each distinct component set once
+    and only visits live entities.
+    """
+    domain = ecs.domain
+    for i in range(50):
+        entity = domain.entities.create()
+        ecs.components.attach(entity, Position)
+        if i % 2:
+            ecs.components.attach(entity, Velocity)
+    doomed = domain.entities.create()
+    ecs.components.attach(doomed, Position)
+    domain.destroy_entity(doomed)
+
+    movers = domain.create_query(all_of = [Position, Velocity])
+    assert len(movers._verdicts) <= len(domain.archetypes)
+    assert all(ecs.components.has(e, Velocity) for e in movers.result)
+    assert doomed not in movers.result
+    assert sum(len(a.entities) for a in domain.archetypes) == len(
+        list(domain.entities)
+    )
+
+
+def test_lazy_loader(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """
+    Test that a lazy Loader registers component names from its manifest and
+    only imports a component's module once the component is resolved.
+    """
+    import sys
+    from pecs_framework import Loader
+
+    package = tmp_path / "lazycomps"
+    package.mkdir()
+    (package / "__init__.py").write_text("")
+    for module, name in (("shield_bearer", "ShieldBearer"), ("sword", "Sword")):
+        (package / f"{module}.py").write_text(
+            "from dataclasses import dataclass\n"
+            "from pecs_framework import Component\n\n\n"
+            f"@dataclass\nclass {name}(Component):\n    weight: int = 1\n"
+        )
+    monkeypatch.syspath_prepend(str(tmp_path))
+
+    manifest = tmp_path / "manifest.json"
+    loader = Loader(str(package / "__init__.py"), lazy = True, manifest = manifest)
+    ecs = Engine(loader = loader)
+    ecs.create_domain("Lazy")
+    ecs.components.load("lazycomps")
+
+    assert manifest.exists()
+    assert sorted(ecs.components.names()) == ["SHIELDBEARER", "SWORD"]
+    assert "lazycomps.sword" not in sys.modules
+
+    entity = ecs.domain.entities.create()
+    ecs.components.attach(entity, "sword", {"weight": 3})
+    assert "lazycomps.sword" in sys.modules
+    assert "lazycomps.shield_bearer" not in sys.modules
+
+    sword = ecs.components.get_type("Sword")
+    assert sword.cbit == 1
+    assert entity[sword].weight == 3
+    assert ecs.components.get_type("ShieldBearer").cbit == 0
+
+    # A second loader reuses the cached manifest.
+    assert Loader(str(package / "__init__.py"), manifest = manifest).manifest() == {
+        "ShieldBearer": "shield_bearer",
+        "Sword": "sword",
+    }
+
+
+def test_lazy_loader_direct_import(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """
+    Test that component classes from a lazy Loader's package get their
+    reserved cbit when imported directly, before or after the package is
+    loaded.
+    """
+    import importlib
+    from pecs_framework import Loader
+
+    package = tmp_path / "directcomps"
+    package.mkdir()
+    (package / "__init__.py").write_text("")
+    for name in ("Alpha", "Beta", "Gamma"):
+        (package / f"{name.lower()}.py").write_text(
+            "from pecs_framework import Component\n\n\n"
+            f"class {name}(Component):\n    pass\n"
+        )
+    monkeypatch.syspath_prepend(str(tmp_path))
+
+    gamma = importlib.import_module("directcomps.gamma").Gamma
+    ecs = Engine(loader = Loader(str(package / "__init__.py"), lazy = True))
+    ecs.create_domain("Direct")
+    ecs.components.load("directcomps")
+    assert gamma.cbit == 2
+    assert ecs.components.get_type("Gamma") is gamma
+
+    beta = importlib.import_module("directcomps.beta").Beta
+    assert beta.cbit == 1
+
+    entity = ecs.domain.entities.create()
+    ecs.components.attach(entity, beta())
+    betas = ecs.domain.create_query(all_of = [beta])
+    assert list(betas.result) == [entity]
+    assert not ecs.components.has(entity, ecs.components.get_type("Alpha"))
+
+
+def test_domain_fork(ecs: Engine) -> None:
+    """
+    Test that a forked Domain shares component instances until the child
+    reads them, and that neither side sees the other's changes afterwards.
+    """
+    domain = ecs.domain
+    e1 = domain.entities.get_by_alias('e1')
+    e1[Position].x = 5
+
+    child = domain.fork()
+    twin = child.entities.get_by_alias('e1')
+    assert twin is not e1
+    assert twin.eid == e1.eid
+    assert twin.cbits == e1.cbits
+    assert twin.components['POSITION'] is e1.components['POSITION']
+
+    twin[Position].x = 50
+    assert twin.components['POSITION'] is not e1.components['POSITION']
+    assert e1[Position].x == 5
+
+    velocity = twin[Velocity]
+    e1[Velocity].x = 7
+    assert velocity.x != 7
+
+    ecs.components.remove(twin, Velocity)
+    assert ecs.components.has(e1, Velocity)
+    child.destroy_entity(twin)
+    assert e1.eid in domain.entities.keys()
+    assert e1[Position].x == 5
+
+    movers = child.create_query(all_of = [Position, Velocity])
+    assert twin not in movers.result
+    assert len(movers.result) == len(
+        domain.create_query(all_of = [Position, Velocity]).result
+    ) - 1
+
+
+def test_domain_fork_parent_untouched(ecs: Engine) -> None:
+    """
+    Test that forking leaves the parent's component instances in place, so
+    that references the parent already holds keep writing through.
+    """
+    domain = ecs.domain
+    e1 = domain.entities.get_by_alias('e1')
+    position = e1[Position]
+
+    child = domain.fork()
+    position.x = 123
+    assert e1[Position] is position
+    assert e1[Position].x == 123
+    assert not e1._shared
+
+    twin = child.entities.get_by_alias('e1')
+    twin[Position].x = 9
+    assert position.x == 123
+
+
+def test_snapshot_buffer(ecs: Engine) -> None:
+    """
+    Test that a snapshot buffer keeps only the most recent ticks and
+    restores entities, component values and query membership in place.
+    """
+    domain = ecs.domain
+    snapshots = domain.enable_snapshots(capacity = 3)
+    movers = domain.create_query(all_of = [Position, Velocity])
+    e1 = domain.entities.get_by_alias('e1')
+    members = set(movers.result)
+
+    snapshots.capture()
+    for tick in range(1, 5):
+        domain.advance_tick()
+        e1[Position].x = tick * 10
+        snapshots.capture()
+    assert snapshots.ticks == [2, 3, 4]
+    assert len(snapshots._diffs[-1].changed) == 1
+
+    ecs.components.remove(e1, Velocity)
+    spawned = domain.entities.create('spawned')
+    ecs.components.attach(spawned, Position)
+    domain.advance_tick()
+    snapshots.capture()
+    assert 'spawned' in snapshots.state_at(5)[spawned.eid][0]
+
+    snapshots.restore(3)
+    assert domain.tick == 3
+    assert e1[Position].x == 30
+    assert ecs.components.has(e1, Velocity)
+    assert spawned.eid not in domain.entities.keys()
+    assert 'spawned' not in domain.entities.alias_to_eid
+    assert set(movers.result) == members
+    assert snapshots.ticks == [3]
+
+    with pytest.raises(KeyError):
+        snapshots.restore(1)
+
+
+def test_replication(ecs: Engine) -> None:
+    """
+    Test that delta packets bring a client Domain up to date, only carry
+    what changed since the client's acknowledged state, and survive lost
+    packets.
+    """
+    from pecs_framework.replication import DeltaDecoder, Replicator
+
+    server = ecs.domain
+    replicator = Replicator(server.create_query(all_of = [Position]))
+    replicator.add_client('alice')
+
+    client = Engine(loader = loader)
+    client.create_domain('Client')
+    client.components.load("tests.components")
+    decoder = DeltaDecoder(client.domain)
+
+    def sync() -> bytes:
+        replicator.capture()
+        packet = replicator.encode('alice')
+        replicator.ack('alice', decoder.apply(packet))
+        return packet
+
+    full = sync()
+    e1 = server.entities.get_by_alias('e1')
+    twin = client.domain.entities.get_by_alias('e1')
+    assert twin.eid == e1.eid
+    assert twin[Position].x == e1[Position].x
+
+    e1[Position].x = 42
+    delta = sync()
+    assert len(delta) < len(full) // 10
+    assert twin[Position].x == 42
+
+    # A lost packet is covered by the next one.
+    e1[Position].y = 7
+    replicator.capture()
+    replicator.encode('alice')
+    e1[Position].x = 43
+    sync()
+    assert (twin[Position].x, twin[Position].y) == (43, 7)
+
+    # A value reverted after an applied but unacknowledged packet is resent.
+    e1[Position].x = 0
+    replicator.capture()
+    decoder.apply(replicator.encode('alice'))
+    e1[Position].x = 43
+    sync()
+    assert twin[Position].x == 43
+
+    ecs.components.remove(e1, Velocity)
+    server.destroy_entity(server.entities.get_by_alias('e2'))
+    sync()
+    assert not client.components.has(twin, Velocity)
+    assert 'e2' not in client.domain.entities.alias_to_eid
+
+    # Nothing changed: an empty string table, the sequence and two zero counts.
+    assert len(sync()) == 4
+
+
+def test_replication_tags_and_resync(ecs: Engine) -> None:
+    """
+    Test that tag components are replicated, that a client which stops
+    acknowledging is resynced in full once too many packets are pending,
+    and that net ids are dropped once every client has acked a destroy.
+    """
+    from pecs_framework.replication import DeltaDecoder, Replicator
+
+    server = ecs.domain
+    ecs.components.register(IsBurning)
+    replicator = Replicator(server.create_query(all_of = [Position]))
+    replicator.max_pending = 4
+    replicator.add_client('alice')
+
+    client = Engine(loader = loader)
+    client.create_domain('Client')
+    client.components.load("tests.components")
+    client.components.register(IsBurning)
+    decoder = DeltaDecoder(client.domain)
+
+    def sync() -> None:
+        replicator.capture()
+        replicator.ack('alice', decoder.apply(replicator.encode('alice')))
+
+    e1 = server.entities.get_by_alias('e1')
+    ecs.components.attach(e1, IsBurning)
+    sync()
+    twin = client.domain.entities.get_by_alias('e1')
+    assert client.components.has(twin, IsBurning)
+
+    ecs.components.remove(e1, IsBurning)
+    sync()
+    assert not client.components.has(twin, IsBurning)
+
+    # Every packet but the last is lost, and none is acknowledged.
+    ecs.components.attach(e1, IsBurning)
+    ecs.components.remove(e1, Velocity)
+    server.destroy_entity(server.entities.get_by_alias('e2'))
+    for _ in range(10):
+        replicator.capture()
+        packet = replicator.encode('alice')
+        assert len(replicator._clients['alice'].pending) <= 4
+    decoder.apply(packet)
+    assert client.components.has(twin, IsBurning)
+    assert not client.components.has(twin, Velocity)
+    assert 'e2' not in client.domain.entities.alias_to_eid
+
+    held = len(replicator._net_ids)
+    sync()
+    assert len(replicator._net_ids) == held - 1
+
+
+def by_x(entity: Entity) -> int:
+    return entity[Position].x
+
+
+def test_sorted_query(ecs: Engine) -> None:
+    """
+    Test that a sorted query keeps its result ordered as entities enter and
+    leave, and repositions an entity when its components are marked changed.
+    """
+    domain = ecs.domain
+    for entity in domain.entities:
+        ecs.components.remove(entity, Position)
+    for x in (5, 1, 3):
+        entity = domain.entities.create(f"x{x}")
+        ecs.components.attach(entity, Position, {"x": x})
+
+    ordered = domain.create_query(all_of = [Position], sort_key = by_x)
+    assert ordered != domain.create_query(all_of = [Position])
+    assert ordered == domain.create_query(all_of = [Position], sort_key = by_x)
+    assert [by_x(e) for e in ordered.result] == [1, 3, 5]
+
+    late = domain.entities.create('x4')
+    ecs.components.attach(late, Position, {"x": 4})
+    assert [by_x(e) for e in ordered.result] == [1, 3, 4, 5]
+    assert ordered.index(late) == 2
+
+    late[Position].x = 0
+    late.mark_changed(Position)
+    assert [by_x(e) for e in ordered.result] == [0, 1, 3, 5]
+    assert ordered.index(late) == 0
+
+    ecs.components.remove(domain.entities.get_by_alias('x3'), Position)
+    assert [by_x(e) for e in ordered.result] == [0, 1, 5]
+
+
+@dataclass
+class Target(Component):
+    """Component referencing another entity."""
+    entity: Entity | None = None
+    hits: int = 0
+
+    def on_strike(self, evt) -> None:
+        self.hits += 1
+
+
+def test_domain_fork_entity_reference(ecs: Engine) -> None:
+    """
+    Test that copying a forked component that references another entity
+    points it at the child's entity instead of copying the entity, so that
+    events fired through it stay in the child.
+    """
+    ecs.components.register(Target)
+    domain = ecs.domain
+    e1 = domain.entities.get_by_alias('e1')
+    e2 = domain.entities.get_by_alias('e2')
+    ecs.components.attach(e1, Target(e2))
+
+    child = domain.fork()
+    twin = child.entities.get_by_alias('e1')
+    assert twin[Target] is not e1[Target]
+    assert twin[Target].entity is child.entities.get_by_alias('e2')
+    assert e1[Target].entity is e2
+
+    twin.fire_event('strike')
+    assert twin[Target].hits == 1
+    assert e1[Target].hits == 0
+
+    ecs.components.attach(e2, Target())
+    twin[Target].entity.fire_event('strike')
+    assert e2[Target].hits == 0
+
+
+def test_snapshot_entity_reference(ecs: Engine) -> None:
+    """
+    Test that snapshots keep entity references held by components, also
+    inside containers, instead of copying the referenced entity, and that
+    replication refuses such fields with a clear error.
+    """
+    from pecs_framework.replication import public_state
+
+    ecs.components.register(Target)
+    domain = ecs.domain
+    e1 = domain.entities.get_by_alias('e1')
+    e2 = domain.entities.get_by_alias('e2')
+    ecs.components.attach(e1, Target(e2))
+    e1[Target].group = [e2, {'leader': e1}]
+
+    snapshots = domain.enable_snapshots(capacity = 4)
+    snapshots.capture()
+    e1[Target].hits = 3
+    e1[Target].group[0] = None
+    domain.advance_tick()
+    snapshots.capture()
+
+    snapshots.restore(0)
+    assert e1[Target].entity is e2
+    assert e1[Target].hits == 0
+    assert e1[Target].group == [e2, {'leader': e1}]
+
+    with pytest.raises(TypeError, match = "TARGET.entity"):
+        public_state(e1)